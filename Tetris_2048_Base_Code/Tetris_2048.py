@@ -8,125 +8,154 @@ import lib.stddraw as stddraw  # for creating an animation with user interaction
 from lib.picture import Picture  # used for displaying an image on the game menu
 from lib.color import Color  # used for coloring the game menu
 import os  # the os module is used for file and directory operations
-from game_grid import GameGrid  # the class for modeling the game grid
+import random  # used for choosing the seeds of the games
+import argparse  # used for parsing the command line arguments
 from tetromino import Tetromino  # the class for modeling the tetrominoes
 from point import Point  # Add this import for Point class
-import random  # used for creating tetrominoes with random types (shapes)
+# the headless game engine that runs the game rules
+from game_engine import TetrisGame
+from game_grid import GameGrid  # the class for modeling the game grid
+# the binary replays of the games
+from replay import ReplayWriter, ReplayReader, create_game, TICK
+from game_engine import ACTIONS  # the actions recorded in the replays
+from agent import ExpectimaxAgent  # the built-in AI player
 
-# The main function where this program starts execution
-def start():
-   # set the dimensions of the game grid
-   grid_h, grid_w = 20, 12
+# The target number of frames shown per second
+FRAME_RATE = 60
+# The longest time (in milliseconds) a single frame can advance the game
+MAX_FRAME_MS = 250
+# The delayed auto shift and the auto repeat rate (in milliseconds) of the
+# keys that move the active tetromino while they are held
+KEY_REPEAT_DELAY_MS = 170
+KEY_REPEAT_INTERVAL_MS = 50
+# The time budget (in seconds) of the search of the AI player in each frame,
+# which keeps the frames on time while it searches over the frames
+AI_TIME_BUDGET = 0.5 / FRAME_RATE
+
+# A function for setting up the drawing canvas for a game grid with the
+# given dimensions
+def setup_canvas(grid_h, grid_w):
    # set the size of the drawing canvas (the displayed window)
    canvas_h, canvas_w = 40 * grid_h, 40 * (grid_w + 6)  # Added width for next tetromino
    stddraw.setCanvasSize(canvas_w, canvas_h)
    # set the scale of the coordinate system for the drawing canvas
    stddraw.setXscale(-0.5, grid_w + 5.5)  # Extended scale to show next tetromino
    stddraw.setYscale(-0.5, grid_h - 0.5)
+   # show only the changed parts of the canvas in each frame, where the game
+   # grid repaints only the cells that changed since the previous frame
+   stddraw.setDirtyRectMode(True)
+   GameGrid.repaint_changes_only = True
+   # the arrow keys that move the active tetromino repeat while held
+   stddraw.setKeyRepeat(KEY_REPEAT_DELAY_MS, KEY_REPEAT_INTERVAL_MS,
+                        ("left", "right", "down"))
 
-   # set the game grid dimension values stored and used in the Tetromino class
-   Tetromino.grid_height = grid_h
-   Tetromino.grid_width = grid_w
-   # create the game grid
-   grid = GameGrid(grid_h, grid_w)
-   # create the first tetromino to enter the game grid
-   # by using the create_tetromino function defined below
-   # create the first tetromino and next tetromino
-   current_tetromino = create_tetromino()
-   next_tetromino = create_tetromino()  # Add this line
-   grid.current_tetromino = current_tetromino
+# The main function where this program starts execution; when record_path is
+# given, the games played are appended to the replay file at this path, and
+# when agent is given (see agent.ExpectimaxAgent), it plays the games
+def start(record_path=None, agent=None):
+   # set the dimensions of the game grid
+   grid_h, grid_w = 20, 12
+   setup_canvas(grid_h, grid_w)
+   writer = ReplayWriter(record_path) if record_path is not None else None
+
+   # create the game (the game rules run in the headless TetrisGame class,
+   # this function only handles the user interaction and the drawing); a
+   # recorded game needs a known seed to be replayed
+   game = TetrisGame(grid_h, grid_w, random.randrange(1 << 62))
+   if writer is not None:
+      writer.begin_game(game)
 
    # display a simple menu before opening the game
    # by using the display_game_menu function defined below
    display_game_menu(grid_h, grid_w)
+   stddraw.clearKeysTyped()  # the keys typed on the menu are not applied
+   stddraw.showFrame()  # start the frame clock after the menu
 
-   # the main game loop
+   # the main game loop: the keys are applied as soon as they are read, the
+   # auto fall advances in fixed logic ticks at the gravity of the current
+   # level and the canvas is shown at (at most) FRAME_RATE frames per second
+   elapsed_ms = 0.0  # the time not yet consumed by the logic ticks
+   agent_piece = None  # the tetromino the AI player last moved (its number)
    while True:
-      # check for any user interaction via the keyboard
-      if stddraw.hasNextKeyTyped():  # check if the user has pressed a key
-         key_typed = stddraw.nextKeyTyped()  # the most recently pressed key
-         # if the left arrow key has been pressed
-         if key_typed == "left":
-            # move the active tetromino left by one
-            current_tetromino.move(key_typed, grid)
-         # if the right arrow key has been pressed
-         elif key_typed == "right":
-            # move the active tetromino right by one
-            current_tetromino.move(key_typed, grid)
-         # if the down arrow key has been pressed
-         elif key_typed == "down":
-            # move the active tetromino down by one
-            current_tetromino.move(key_typed, grid)
-         elif key_typed == "up":
-            current_tetromino.rotate(grid) 
-         elif key_typed == "space":
-            current_tetromino.hard_drop(grid) 
-            
-         # clear the queue of the pressed keys for a smoother interaction
+      # apply every key the user pressed since the previous frame (left,
+      # right, down, up or space, including the repeats of the held arrow
+      # keys) to the active tetromino in the order they were pressed
+      game_over = False
+      while stddraw.hasNextKeyTyped():
+         key_typed = stddraw.nextKeyTyped()
+         game.act(key_typed)
+         if writer is not None:
+            writer.record_action(key_typed)
+         # a hard dropped tetromino is locked onto the grid immediately
+         if key_typed == "space":
+            game_over = game.tick()
+            elapsed_ms = 0.0
+            if writer is not None:
+               writer.record_tick()
+
+      # the AI player searches for the placement of each new tetromino for a
+      # part of each frame until its search is complete or the next logic
+      # tick is due, then moves the tetromino there to be hard dropped at
+      # that tick
+      tick_ms = 1000 / game.gravity()
+      if agent is not None and not game_over and game.pieces_placed != agent_piece:
+         if elapsed_ms >= tick_ms or agent.search(game):
+            agent_piece = game.pieces_placed
+            for action in agent.plan(game, drop=False):
+               game.act(action)
+               if writer is not None:
+                  writer.record_action(action)
+
+      # move the active tetromino down by one (auto fall) once per logic tick,
+      # locking it onto the grid when it cannot go down anymore
+      while not game_over and elapsed_ms >= tick_ms:
+         elapsed_ms -= tick_ms
+         # only the tetromino moved by the AI player is dropped (a new one
+         # falls by one row until the AI player has placed it)
+         if agent is not None and game.pieces_placed == agent_piece:
+            game.act("space")
+            if writer is not None:
+               writer.record_action("space")
+         game_over = game.tick()
+         if writer is not None:
+            writer.record_tick()
+
+      # end the current game if the game is over
+      if game_over:
+         if writer is not None:
+            writer.end_game(game.grid.score)
+         stddraw.clear(Color(0, 0, 0))
+         stddraw.setFontFamily("Arial")
+         stddraw.setFontSize(50)
+         stddraw.setPenColor(Color(255, 0, 0))
+         stddraw.text((grid_w + 5) / 2, grid_h / 2, "GAME OVER")
+         stddraw.setFontSize(30)
+         stddraw.setPenColor(Color(255, 255, 255))
+         stddraw.text((grid_w + 5) / 2, grid_h / 2 - 1, f"Score: {game.grid.score}")
+
+         stddraw.show(2000)   # 2 saniye bekle
+
+         # 2) Başlangıç menüsüne dön
+         display_game_menu(grid_h, grid_w)
+
+         # 3) Yeni bir oyun başlat
+         game = TetrisGame(grid_h, grid_w, random.randrange(1 << 62))
+         if writer is not None:
+            writer.begin_game(game)
+         elapsed_ms = 0.0
+         agent_piece = None
          stddraw.clearKeysTyped()
+         stddraw.showFrame()  # restart the frame clock after the menu
+
+         # Döngünün başına dön ve yeniden oyna
+         continue
 
-      # move the active tetromino down by one at each iteration (auto fall)
-      success = current_tetromino.move("down", grid)
-      
-      # lock the active tetromino onto the grid when it cannot go down anymore
-      if not success:
-         # get the tile matrix of the tetromino without empty rows and columns
-         # and the position of the bottom left cell in this matrix
-         tiles, pos = current_tetromino.get_min_bounded_tile_matrix(True)
-         # update the game grid by locking the tiles of the landed tetromino
-         game_over = grid.update_grid(tiles, pos)
-         # end the main game loop if the game is over
-         if game_over:
-            stddraw.clear(Color(0, 0, 0))
-            stddraw.setFontFamily("Arial")
-            stddraw.setFontSize(50)
-            stddraw.setPenColor(Color(255, 0, 0))
-            stddraw.text((grid_w + 5) / 2, grid_h / 2, "GAME OVER")
-            stddraw.setFontSize(30)
-            stddraw.setPenColor(Color(255, 255, 255))
-            stddraw.text((grid_w + 5) / 2, grid_h / 2 - 1, f"Score: {grid.score}")
-
-            stddraw.show(2000)   # 2 saniye bekle
-
-            # 2) Başlangıç menüsüne dön
-            display_game_menu(grid_h, grid_w)
-
-            # 3) Yeni bir oyun başlatmak için grid ve tetrominoları resetle
-            grid = GameGrid(grid_h, grid_w)
-            current_tetromino = create_tetromino()
-            next_tetromino = create_tetromino()
-            grid.current_tetromino = current_tetromino
-
-            # Döngünün başına dön ve yeniden oyna
-            continue
-         # create the next tetromino to enter the game grid
-         # by using the create_tetromino function defined below
-         current_tetromino = next_tetromino
-         next_tetromino = create_tetromino()  # Create new next tetromino
-         grid.current_tetromino = current_tetromino
-
-      # display the game grid and next tetromino
-      grid.display()
-      draw_next_tetromino(next_tetromino)  # Add this line
-      stddraw.show(50)  # Add this to update the display
-
-   # print a message on the console when the game is over
-   print("Game over")
-
-# A function for creating random shaped tetrominoes to enter the game grid
-def create_tetromino():
-   # the type (shape) of the tetromino is determined randomly
-   tetromino_types = ['I', 'I-90', 'I-270', 'I-180', 'O',
-                     'Z', 'Z-90', 'Z-180', 'Z-270', 
-                     'T', 'T-90', 'T-180', 'T-270',  # Virgül eklendi
-                     'J', 'J-90', 'J-180', 'J-270',
-                     'L', 'L-90', 'L-180', 'L-270',
-                     'S', 'S-90', 'S-180', 'S-270']
-   random_index = random.randint(0, len(tetromino_types) - 1)
-   random_type = tetromino_types[random_index]
-   # create and return the tetromino
-   tetromino = Tetromino(random_type)
-   return tetromino
+      # display the game grid and next tetromino, then wait for the next frame
+      game.grid.display()
+      draw_next_tetromino(game.next_tetromino)  # Add this line
+      # a long stall (e.g. while the window is dragged) does not make the
+      # tetromino fall many cells at once
+      elapsed_ms += min(stddraw.showFrame(FRAME_RATE), MAX_FRAME_MS)
 
 # A function for displaying a simple menu before starting the game
 def display_game_menu(grid_height, grid_width):
@@ -182,12 +211,20 @@ def draw_next_tetromino(tetromino):
     panel_width = 4
     panel_height = 4
     
+    # Restore the grid background around the panel, which is not painted over
+    # in each frame when only the changes are repainted (the tiles of the
+    # largest tetrominoes stick out of the panel by half a cell)
+    stddraw.drawLayer(GameGrid.background_layer, panel_start_x - 0.5,
+                      panel_start_y - 0.5, panel_width + 1, panel_height + 1.5)
+
     # Draw panel background
     stddraw.setPenColor(Color(42, 69, 99))
     stddraw.filledRectangle(panel_start_x, panel_start_y, panel_width, panel_height)
     
     # Draw "Next" text
     stddraw.setPenColor(Color(31, 160, 239))
+    stddraw.setFontFamily("Arial")
+    stddraw.setFontSize(18)
     stddraw.text(panel_start_x + panel_width/2, panel_start_y + panel_height + 0.5, "Next")
     
     # Center the tetromino in the panel
@@ -205,7 +242,40 @@ def draw_next_tetromino(tetromino):
 
 
 
+# A function for playing back the games of a replay file on the drawing
+# canvas; speed scales the recorded gravity (the auto fall ticks are shown at
+# speed times the gravity of the level), and 0 shows them as fast as possible
+def play_replay(path, speed=1.0):
+   reader = ReplayReader(path)
+   try:
+      header = reader.read_header()
+      if header is not None:
+         setup_canvas(header.grid_h, header.grid_w)
+      while header is not None:
+         game = create_game(header, packed=False)
+         for events in reader.iter_events():
+            for code in events:
+               if code != TICK:
+                  game.act(ACTIONS[code - 1])
+                  continue
+               game.tick()
+               game.grid.display()
+               draw_next_tetromino(game.next_tetromino)
+               stddraw.showFrame(game.gravity() * speed)
+         header = reader.read_header()
+   finally:
+      reader.close()
+
 # start() function is specified as the entry point (main function) from which
 # the program starts execution
 if __name__ == '__main__':
-   start()
+   parser = argparse.ArgumentParser(description="Play Tetris 2048")
+   parser.add_argument("--record", default=None, help="the replay file to append the games to")
+   parser.add_argument("--replay", default=None, help="the replay file to play back")
+   parser.add_argument("--speed", type=float, default=1.0, help="the playback speed (0 for the fastest)")
+   parser.add_argument("--ai", action="store_true", help="let the built-in AI player play")
+   args = parser.parse_args()
+   if args.replay is not None:
+      play_replay(args.replay, args.speed)
+   else:
+      start(args.record, ExpectimaxAgent(time_budget=AI_TIME_BUDGET) if args.ai else None)
@@ -0,0 +1,290 @@
+################################################################################
+#                                                                              #
+# A built-in AI player of Tetris 2048 that chooses the placements of the       #
+# tetrominoes by an expectimax search                                          #
+#                                                                              #
+################################################################################
+
+from placements import enumerate_placements, find_path  # the reachable placements
+from piece_generator import BASE_TYPES, TETROMINO_TYPES  # the types of the pieces
+from game_grid import value_to_exponent  # the tile values as log2 exponents
+from tetromino import SHAPES  # the shape table of the tetrominoes
+from board_features import board_features  # the features of the boards
+from collections import namedtuple, OrderedDict  # the pieces and the table
+import numpy as np  # the fundamental Python module for scientific computing
+import random  # used for drawing the sampled tile values
+import time  # used for the time budget of the search
+
+# The weights of the features of a board in its evaluation (see evaluate):
+# the empty cells below the top of their columns, the sum of the column
+# heights, the sum of the height differences of the adjacent columns and the
+# square of the number of rows the stack reaches into the top DANGER_ROWS
+# rows of the grid (where the tetrominoes enter)
+HOLE_WEIGHT = -24.0
+HEIGHT_WEIGHT = -1.5
+BUMPINESS_WEIGHT = -3.0
+DANGER_WEIGHT = -200.0
+DANGER_ROWS = 6
+# The value of a board where the game is over
+GAME_OVER_VALUE = -1e6
+
+# A piece in the search: its type, the position (x, y) of its bottom left cell
+# and the log2 exponents of its tile values in the order of the cells of its
+# shape
+_SearchPiece = namedtuple('_SearchPiece', ['type', 'x', 'y', 'tiles'])
+
+# The probability of each base shape under each mode of the piece generator
+# (an unseen piece of the "uniform" mode is any of TETROMINO_TYPES, while the
+# "bag" mode deals the base shapes evenly)
+_BASE_PROBABILITIES = {
+   "uniform": [sum(t.split('-')[0] == base for t in TETROMINO_TYPES) / len(TETROMINO_TYPES)
+               for base in BASE_TYPES],
+   "bag": [1 / len(BASE_TYPES)] * len(BASE_TYPES)}
+
+# An exception raised inside the search when its time budget runs out
+class _SearchTimeout(Exception):
+   pass
+
+# A function that returns the heuristic values of boards of the given height
+# from the shapes of their stacks (see the weights above), given their
+# features (see board_features); the score gained by reaching the boards is
+# added by the search separately
+def evaluate_features(features, grid_h):
+   danger = np.maximum(features.max_height - (grid_h - DANGER_ROWS), 0)
+   return (HOLE_WEIGHT * features.holes + HEIGHT_WEIGHT * features.aggregate_height +
+           BUMPINESS_WEIGHT * features.bumpiness + DANGER_WEIGHT * danger * danger)
+
+# A function that returns the heuristic value of the given game grid
+def evaluate(grid):
+   features = board_features(grid.get_exponent_matrix())
+   return float(evaluate_features(features, grid.grid_height))
+
+# A function for locking a piece with the given tile exponents at the given
+# placement onto a (packed) grid; returns the score gained by its merges and
+# cleared rows
+def _lock(grid, placement, tiles):
+   shape = SHAPES[placement.type]
+   top = placement.y + shape.n - 1  # the grid row of the top row of the matrix
+   score = grid.score
+   grid.lock_cells([(top - row, placement.x + col, tile)
+                    for (col, row), tile in zip(shape.cells, tiles)])
+   return grid.score - score
+
+# A function that returns the given tetromino as a piece of the search
+def _search_piece(tetromino):
+   tiles = tuple(value_to_exponent(tetromino.tile_matrix[row][col].number)
+                 for col, row in tetromino.shape.cells)
+   return _SearchPiece(tetromino.type, tetromino.bottom_left_cell.x,
+                       tetromino.bottom_left_cell.y, tiles)
+
+# A class for an AI player that chooses where to place the active tetromino
+# by an expectimax search: the active and the next tetromino are known, while
+# each piece after them is a chance node over the base shapes (weighted by
+# the mode of the piece generator) and a few sampled vectors of the random
+# 2/4 tile values (see Tile.__init__). The values of the nodes are kept in a
+# transposition table keyed by the Zobrist hash of the board (and the known
+# pieces still to come, if any) with the number of placements they were
+# searched to, so an entry is reused for any search of at most that depth;
+# the table is bounded to table_size entries with least recently used
+# eviction and kept between the moves. Below the first placement only the
+# beam_width most promising placements of each piece are searched further.
+# The search deepens iteratively up to max_depth placements for at most its
+# time budget (in seconds, None for no limit) per call of search, and a call
+# for the same tetromino resumes it, so the search of a move can be spread
+# over the frames of the game loop while the tetromino falls: the subtrees
+# completed by an unfinished depth are found in the table when it is
+# searched again.
+#
+# An agent is also a policy (see tournament) that returns one action per step.
+class ExpectimaxAgent:
+   # A constructor for creating an agent with the given search settings,
+   # where seed seeds the sampled tile values of the chance nodes
+   def __init__(self, max_depth=3, time_budget=None, beam_width=6, tile_samples=2,
+                table_size=1 << 16, seed=0):
+      self.max_depth = max_depth
+      self.beam_width = beam_width
+      self.time_budget = time_budget
+      rng = random.Random(seed)
+      self.tile_samples = [tuple(rng.choice((1, 2)) for _ in range(4))
+                           for _ in range(tile_samples)]
+      self.table_size = table_size
+      self.table = OrderedDict()
+      # the settings the values in the table were computed for (the grid
+      # dimensions and the piece generator mode)
+      self.table_context = None
+      self.deadline = None
+      # the search of the active tetromino (see search): the game and the
+      # number of the tetromino, the placement chosen by the deepest
+      # completed depth and whether the search is complete
+      self.search_key = None
+      self.best = None
+      self.complete = False
+      # the statistics of the search of the active tetromino over all its
+      # calls: the completed depth and the numbers of evaluated placements
+      # and transposition table hits
+      self.depth = 0
+      self.nodes = 0
+      self.table_hits = 0
+      # the placement chosen for the active tetromino (see __call__)
+      self.target = None
+      self.target_key = None
+
+   # A method that returns the value stored in the transposition table for
+   # the given key when it was searched to at least the given depth, or None
+   def _lookup(self, key, depth):
+      entry = self.table.get(key)
+      if entry is None or entry[0] < depth:
+         return None
+      self.table.move_to_end(key)
+      self.table_hits += 1
+      return entry[1]
+
+   # A method that stores a value searched to the given depth in the
+   # transposition table, evicting the least recently used entry when the
+   # table is full
+   def _store(self, key, depth, value):
+      self.table[key] = (depth, value)
+      if len(self.table) > self.table_size:
+         self.table.popitem(last=False)
+
+   # A method that returns the placements of the given piece on the given
+   # grid paired with the value of each of them: the score gained by locking
+   # the piece there plus the value of the resulting grid with the given
+   # known pieces coming next and depth - 1 more placements to search. Only
+   # the beam_width placements with the best values after one placement are
+   # searched deeper (and returned) when depth is more than 1.
+   def _placement_values(self, grid, piece, known, depth):
+      children = []
+      for placement in enumerate_placements(grid, piece.type, piece.x, piece.y, piece.tiles):
+         if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise _SearchTimeout()
+         self.nodes += 1
+         child = grid.copy()
+         gained = _lock(child, placement, piece.tiles)
+         children.append([gained + GAME_OVER_VALUE, gained, placement, child])
+      # the boards of all the children are evaluated together
+      alive = [child for child in children if not child[3].game_over]
+      if alive:
+         boards = np.stack([child[3].exponent_matrix for child in alive])
+         values = evaluate_features(board_features(boards), grid.grid_height)
+         for child, value in zip(alive, values.tolist()):
+            child[0] = child[1] + value
+      if depth == 1:
+         return [(placement, value) for value, _, placement, _ in children]
+      children.sort(key=lambda child: child[0], reverse=True)
+      return [(placement, gained + self._value(child, known, depth - 1))
+              for _, gained, placement, child in children[:self.beam_width]
+              if not child.game_over]
+
+   # A method that returns the expected value of the given grid with the
+   # given known pieces coming next and depth more placements to search
+   def _value(self, grid, known, depth):
+      # the chance nodes are keyed by the board alone
+      key = (grid.zobrist_hash, known) if known else grid.zobrist_hash
+      value = self._lookup(key, depth)
+      if value is not None:
+         return value
+      if known:
+         values = self._placement_values(grid, known[0], known[1:], depth)
+         value = max((value for _, value in values), default=GAME_OVER_VALUE)
+         self._store(key, depth, value)
+         return value
+      # a chance node over the unseen piece
+      value = 0.0
+      probabilities = _BASE_PROBABILITIES[self.table_context[2]]
+      weight = 1 / len(self.tile_samples)
+      for base, probability in zip(BASE_TYPES, probabilities):
+         n = SHAPES[base].n
+         x = (grid.grid_width - n) // 2
+         for tiles in self.tile_samples:
+            piece = _SearchPiece(base, x, grid.grid_height - 1, tiles)
+            values = self._placement_values(grid, piece, (), depth)
+            best = max((value for _, value in values), default=GAME_OVER_VALUE)
+            value += probability * weight * best
+      self._store(key, depth, value)
+      return value
+
+   # A method that searches for the placement of the active tetromino of the
+   # given game for at most time_budget seconds, resuming the search of the
+   # previous call when the tetromino is the same one (the first depth is
+   # always completed, so there is always a move); returns True when the
+   # search is complete (up to max_depth, or the tetromino has no placement)
+   def search(self, game):
+      key = (id(game), game.pieces_placed)
+      if key != self.search_key:
+         context = (game.grid.grid_height, game.grid.grid_width, game.pieces.mode)
+         if context != self.table_context:
+            self.table.clear()
+            self.table_context = context
+         self.search_key = key
+         self.best = None
+         self.complete = False
+         self.depth = self.nodes = self.table_hits = 0
+      if self.complete:
+         return True
+      grid = game.grid.copy()
+      piece = _search_piece(game.current_tetromino)
+      known = (_search_piece(game.next_tetromino),)
+      start = time.perf_counter()
+      for depth in range(self.depth + 1, self.max_depth + 1):
+         if self.best is not None and self.time_budget is not None:
+            self.deadline = start + self.time_budget
+         try:
+            values = self._placement_values(grid, piece, known, depth)
+         except _SearchTimeout:
+            return False
+         finally:
+            self.deadline = None
+         if not values:
+            break
+         self.best = max(values, key=lambda item: item[1])[0]
+         self.depth = depth
+         if (depth < self.max_depth and self.time_budget is not None and
+               time.perf_counter() - start > self.time_budget):
+            return False
+      self.complete = True
+      return True
+
+   # A method that returns the placement (see placements.Placement) chosen
+   # for the active tetromino of the given game after searching it once more
+   # (see search), or None when it has no placement
+   def choose_placement(self, game):
+      self.search(game)
+      return self.best
+
+   # A method that returns the actions (see game_engine.ACTIONS) that move
+   # the active tetromino of the given game to the chosen placement, ending
+   # with a hard drop unless drop is False (the moves straight down are left
+   # to the hard drop in both cases), or an empty list when it has no placement
+   def plan(self, game, drop=True):
+      placement = self.choose_placement(game)
+      if placement is None:
+         return []
+      path = find_path(game.grid, game.current_tetromino, placement) or []
+      while path and path[-1] == "down":
+         path.pop()
+      return path + ["space"] if drop else path
+
+   # A method for using the agent as a policy: it chooses a placement for
+   # each new active tetromino and returns the next action of the shortest
+   # path to it, which is searched again at each step as the auto fall moves
+   # the tetromino down (the placement is chosen again if it is passed)
+   def __call__(self, game, rng=None):
+      key = (id(game), game.pieces_placed)
+      if key != self.target_key:
+         self.target_key = key
+         self.target = self.choose_placement(game)
+      if self.target is None:
+         return None
+      path = find_path(game.grid, game.current_tetromino, self.target)
+      if path is None:
+         self.search_key = None  # search again from the current position
+         self.target = self.choose_placement(game)
+         if self.target is None:
+            return None
+         path = find_path(game.grid, game.current_tetromino, self.target)
+      if not path:
+         return None
+      if all(action == "down" for action in path):
+         return "space"
+      return path[0]
@@ -0,0 +1,178 @@
+################################################################################
+#                                                                              #
+# A batched game grid that steps many games of Tetris 2048 in lockstep         #
+#                                                                              #
+################################################################################
+
+from game_engine import TETROMINO_TYPES, ACTIONS  # the types and the actions
+from game_grid import merge_exponent_columns  # the vectorized merge engine
+from tetromino import SHAPES  # the precomputed shape table
+import numpy as np  # the fundamental Python module for scientific computing
+
+# The integer codes of the actions: 0 is no action and ACTIONS[i] is i + 1
+NO_ACTION = 0
+LEFT, RIGHT, DOWN, ROTATE, HARD_DROP = (ACTIONS.index(action) + 1 for action in ACTIONS)
+
+# The shape table as arrays indexed by the position of a type in
+# TETROMINO_TYPES: the column offset and the row offset (upwards from the
+# bottom left cell) of each of the four cells, the size n of the tile matrix,
+# the row offset of the topmost cell and the index of the rotated type
+_SHAPES = [SHAPES[shape_type] for shape_type in TETROMINO_TYPES]
+_CELL_DX = np.array([[col for col, row in s.cells] for s in _SHAPES], dtype=np.int64)
+_CELL_DY = np.array([[s.n - 1 - row for col, row in s.cells] for s in _SHAPES], dtype=np.int64)
+_SIZE = np.array([s.n for s in _SHAPES], dtype=np.int64)
+_TOP_DY = np.array([s.n - 1 - s.min_row for s in _SHAPES], dtype=np.int64)
+_ROTATED = np.array([TETROMINO_TYPES.index(s.next_type) for s in _SHAPES], dtype=np.int64)
+
+# A class for modeling N game grids stored together as an (N, H, W) array of
+# log2 tile exponents (the layout of a packed GameGrid) with one active and
+# one next tetromino per game; the moves, locks, merges and row clears of all
+# the games are applied together with vectorized operations
+class BatchGameGrid:
+   # A constructor for creating n_games empty games on grids with the given
+   # dimensions, where the tetrominoes are drawn from a generator seeded with seed
+   def __init__(self, n_games, grid_h=20, grid_w=12, seed=None):
+      self.n_games = n_games
+      self.grid_height = grid_h
+      self.grid_width = grid_w
+      self.rng = np.random.default_rng(seed)
+      self.boards = np.zeros((n_games, grid_h, grid_w), dtype=np.uint8)
+      self.scores = np.zeros(n_games, dtype=np.int64)
+      self.game_over = np.zeros(n_games, dtype=bool)
+      self.pieces_placed = np.zeros(n_games, dtype=np.int64)
+      # the active tetromino of each game: the index of its type in
+      # TETROMINO_TYPES, the position of its bottom left cell and the tile
+      # exponents of its four cells (in the order of the cells of its shape)
+      self.piece_types = np.zeros(n_games, dtype=np.int64)
+      self.piece_x = np.zeros(n_games, dtype=np.int64)
+      self.piece_y = np.zeros(n_games, dtype=np.int64)
+      self.piece_tiles = np.zeros((n_games, 4), dtype=np.uint8)
+      # the next tetromino of each game (created with its spawn position)
+      self.next_types, self.next_x, self.next_tiles = self._create_tetrominoes(n_games)
+      self._spawn(np.arange(n_games))
+
+   # A method for creating k random tetrominoes as with create_tetromino
+   def _create_tetrominoes(self, k):
+      types = self.rng.integers(0, len(TETROMINO_TYPES), size=k)
+      x = self.rng.integers(0, self.grid_width - _SIZE[types] + 1)
+      tiles = self.rng.integers(1, 3, size=(k, 4)).astype(np.uint8)  # 2 or 4
+      return types, x, tiles
+
+   # A method for making the next tetromino the active one in the given games
+   def _spawn(self, games):
+      self.piece_types[games] = self.next_types[games]
+      self.piece_x[games] = self.next_x[games]
+      self.piece_y[games] = self.grid_height - 1
+      self.piece_tiles[games] = self.next_tiles[games]
+      types, x, tiles = self._create_tetrominoes(len(games))
+      self.next_types[games], self.next_x[games], self.next_tiles[games] = types, x, tiles
+
+   # A method that returns the grid positions (xs, ys) of the four cells of
+   # the given types placed with their bottom left cells at (x, y)
+   def _cells(self, types, x, y):
+      return x[:, None] + _CELL_DX[types], y[:, None] + _CELL_DY[types]
+
+   # A method for checking if the given types placed at (x, y) in the given
+   # games lie inside the grids (cells above a grid are allowed) without
+   # overlapping any occupied cell, as Tetromino.fits does
+   def _fits(self, games, types, x, y):
+      xs, ys = self._cells(types, x, y)
+      inside = (xs >= 0) & (xs < self.grid_width) & (ys >= 0)
+      visible = inside & (ys < self.grid_height)
+      occupied = self.boards[games[:, None],
+                             np.clip(ys, 0, self.grid_height - 1),
+                             np.clip(xs, 0, self.grid_width - 1)] != 0
+      return inside.all(axis=1) & ~(visible & occupied).any(axis=1)
+
+   # A method for moving the active tetrominoes of the given games by (dx, dy)
+   # where possible; returns a boolean array marking the successful moves
+   def _move(self, games, dx, dy):
+      types, x, y = self.piece_types[games], self.piece_x[games] + dx, self.piece_y[games] + dy
+      moved = self._fits(games, types, x, y)
+      self.piece_x[games[moved]] = x[moved]
+      self.piece_y[games[moved]] = y[moved]
+      return moved
+
+   # A method for rotating the active tetrominoes of the given games where
+   # the rotated shapes fit (entirely inside the grids, as Tetromino.rotate)
+   def _rotate(self, games):
+      types = _ROTATED[self.piece_types[games]]
+      x, y = self.piece_x[games], self.piece_y[games]
+      rotated = self._fits(games, types, x, y) & (y + _TOP_DY[types] < self.grid_height)
+      self.piece_types[games[rotated]] = types[rotated]
+
+   # A method for dropping the active tetrominoes of the given games as far
+   # as they can go; all the games move down together, row by row
+   def _hard_drop(self, games):
+      while len(games) > 0:
+         games = games[self._move(games, 0, -1)]
+
+   # A method for applying the given action codes (one per game) to the
+   # active tetrominoes of the games that are not over
+   def apply_actions(self, actions):
+      actions = np.asarray(actions)
+      active = ~self.game_over
+      for code, dx, dy in ((LEFT, -1, 0), (RIGHT, 1, 0), (DOWN, 0, -1)):
+         self._move(np.flatnonzero(active & (actions == code)), dx, dy)
+      self._rotate(np.flatnonzero(active & (actions == ROTATE)))
+      self._hard_drop(np.flatnonzero(active & (actions == HARD_DROP)))
+
+   # A method for moving the active tetrominoes of the games that are not over
+   # down by one (auto fall) and locking the ones that cannot go down anymore
+   def tick(self):
+      active = np.flatnonzero(~self.game_over)
+      landed = active[~self._move(active, 0, -1)]
+      if len(landed) > 0:
+         self._lock(landed)
+
+   # A method for running one iteration of the game loop in every game
+   def step(self, actions):
+      self.apply_actions(actions)
+      self.tick()
+      return self.game_over
+
+   # A method for locking the active tetrominoes of the given games onto their
+   # grids, followed by the merges and the row clears as in GameGrid.update_grid
+   def _lock(self, games):
+      xs, ys = self._cells(self.piece_types[games], self.piece_x[games], self.piece_y[games])
+      inside = ys < self.grid_height
+      rows = np.broadcast_to(games[:, None], xs.shape)
+      self.boards[rows[inside], ys[inside], xs[inside]] = self.piece_tiles[games][inside]
+      self.game_over[games] |= ~inside.all(axis=1)
+      self.pieces_placed[games] += 1
+      boards = self.boards[games]  # fancy indexing copies
+      self.scores[games] += self._merge(boards) + self._clear_full_rows(boards)
+      self.boards[games] = boards
+      # the next tetromino enters the grid in the games that are not over
+      self._spawn(games[~self.game_over[games]])
+
+   # A method for merging the columns of the given (k, H, W) boards in place;
+   # the columns of all the boards are merged as one (H, k * W) block.
+   # Returns the merge score of each board.
+   def _merge(self, boards):
+      k, h, w = boards.shape
+      columns = boards.transpose(1, 0, 2).reshape(h, k * w)  # a copy
+      scores = merge_exponent_columns(columns).reshape(k, w).sum(axis=1)
+      boards[:] = columns.reshape(h, k, w).transpose(1, 0, 2)
+      return scores
+
+   # A method for clearing the full rows of the given (k, H, W) boards in
+   # place; returns the sum of the cleared tile values of each board
+   def _clear_full_rows(self, boards):
+      full_rows = (boards != 0).all(axis=2)  # (k, H)
+      if not full_rows.any():
+         return 0
+      values = np.left_shift(1, boards.astype(np.int64)) * full_rows[:, :, None]
+      scores = values.sum(axis=(1, 2))
+      # a stable sort of the full row flags moves the surviving rows down
+      # (keeping their order) and the full rows to the top
+      order = np.argsort(full_rows, axis=1, kind="stable")
+      boards[:] = np.take_along_axis(boards, order[:, :, None], axis=1)
+      n_survivors = (~full_rows).sum(axis=1)
+      boards[np.arange(self.grid_height)[None, :] >= n_survivors[:, None]] = 0
+      return scores
+
+   # A method that returns the maximum tile value of each game
+   def max_tiles(self):
+      exponents = self.boards.max(axis=(1, 2)).astype(np.int64)
+      return np.where(exponents > 0, np.left_shift(1, exponents), 0)
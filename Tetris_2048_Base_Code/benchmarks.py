@@ -0,0 +1,172 @@
+################################################################################
+#                                                                              #
+# Throughput benchmarks of the headless parts of Tetris 2048                   #
+#                                                                              #
+################################################################################
+
+from batch_game_grid import BatchGameGrid  # the batched game grid
+from game_engine import TetrisGame, ACTIONS  # the headless game engine
+from replay import record_games, verify_replays  # the binary replays
+from tournament import random_policy  # the policy used for the replays
+from placements import find_placements  # the placement enumerator
+from agent import ExpectimaxAgent  # the built-in AI player
+from tetris_env import VectorEnv, ENV_ACTIONS  # the learning environments
+import numpy as np  # the fundamental Python module for scientific computing
+import tempfile  # used for the temporary replay file
+import tracemalloc  # used for measuring the memory allocated by the locks
+import copy  # used for the deep copies the locks used to make
+import os  # used for the size of the replay file
+import time  # used for measuring the elapsed times
+
+# A function for comparing the number of game steps per second of the
+# batched game grid with looping over scalar games (each with a GameGrid),
+# where every game is stepped with random actions
+def benchmark_batch(n_games=1000, n_steps=200, grid_h=20, grid_w=12, seed=0):
+   rng = np.random.default_rng(seed)
+   actions = rng.integers(0, len(ACTIONS) + 1, size=(n_steps, n_games))
+   # the batched games, all stepped together
+   batch = BatchGameGrid(n_games, grid_h, grid_w, seed)
+   start_time = time.perf_counter()
+   for step in range(n_steps):
+      batch.step(actions[step])
+   batch_time = time.perf_counter() - start_time
+   # the same number of scalar games (packed grids), stepped one by one
+   games = [TetrisGame(grid_h, grid_w, seed + i, packed=True) for i in range(n_games)]
+   names = (None,) + ACTIONS
+   start_time = time.perf_counter()
+   for step in range(n_steps):
+      for game, action in zip(games, actions[step]):
+         game.step(names[action])
+   scalar_time = time.perf_counter() - start_time
+   n_game_steps = n_games * n_steps
+   print(f"batched: {n_game_steps / batch_time:12.0f} game steps/s")
+   print(f"scalar:  {n_game_steps / scalar_time:12.0f} game steps/s")
+   print(f"speedup: {scalar_time / batch_time:12.1f}x")
+   return n_game_steps / batch_time, n_game_steps / scalar_time
+
+# A function for measuring how many recorded games per second are verified
+# by re-simulating them headlessly from a replay file
+def benchmark_replay(n_games=200, grid_h=20, grid_w=12, seed=0):
+   with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, "games.replay")
+      record_games(path, range(seed, seed + n_games), random_policy, grid_h, grid_w)
+      n_bytes = os.path.getsize(path)
+      start_time = time.perf_counter()
+      matches = verify_replays(path)
+      verify_time = time.perf_counter() - start_time
+   if not all(matches):
+      raise RuntimeError(f"{matches.count(False)} replays did not reproduce their scores")
+   print(f"replay size:   {n_bytes / n_games:12.0f} bytes/game")
+   print(f"verification:  {n_games / verify_time:12.1f} games/s")
+   return n_games / verify_time
+
+# A function for measuring the latency and the memory allocated per lock of
+# a tetromino onto an object grid (the tick that locks a hard dropped
+# tetromino and spawns the next one), next to deep copying the locked tiles
+# (which the locks did before the tiles were handed over to the grid)
+def benchmark_lock(n_locks=2000, grid_h=20, grid_w=12, seed=0):
+   results = {}
+   for measure_memory in (False, True):
+      game = TetrisGame(grid_h, grid_w, seed)
+      lock_cost = copy_cost = 0.0
+      if measure_memory:
+         tracemalloc.start()
+      for i in range(n_locks):
+         if game.game_over:
+            game = TetrisGame(grid_h, grid_w, seed + i)
+         game.current_tetromino.hard_drop(game.grid)
+         # the tiles that the lock used to copy
+         tiles = game.current_tetromino.get_min_bounded_tile_matrix()
+         for cost, run in (("copy", lambda: copy.deepcopy(tiles)), ("lock", game.tick)):
+            if measure_memory:
+               tracemalloc.reset_peak()
+               base = tracemalloc.get_traced_memory()[0]
+               run()
+               used = tracemalloc.get_traced_memory()[1] - base
+            else:
+               start_time = time.perf_counter()
+               run()
+               used = time.perf_counter() - start_time
+            if cost == "copy":
+               copy_cost += used
+            else:
+               lock_cost += used
+      if measure_memory:
+         tracemalloc.stop()
+      results[measure_memory] = (lock_cost / n_locks, copy_cost / n_locks)
+   (lock_time, copy_time), (lock_bytes, copy_bytes) = results[False], results[True]
+   print(f"lock:      {lock_time * 1e6:8.1f} us  {lock_bytes:8.0f} bytes peak")
+   print(f"deepcopy:  {copy_time * 1e6:8.1f} us  {copy_bytes:8.0f} bytes peak (no longer done)")
+   return lock_time, lock_bytes
+
+# A function for measuring how many times per second all the placements of
+# the active tetromino are enumerated, over the positions of random games
+def benchmark_placements(n_games=20, n_steps=300, grid_h=20, grid_w=12, seed=0):
+   rng = np.random.default_rng(seed)
+   names = (None,) + ACTIONS
+   n_calls, n_placements, elapsed = 0, 0, 0.0
+   for i in range(n_games):
+      game = TetrisGame(grid_h, grid_w, seed + i, packed=True)
+      for action in rng.integers(0, len(names), size=n_steps):
+         start_time = time.perf_counter()
+         placements = find_placements(game.grid, game.current_tetromino)
+         elapsed += time.perf_counter() - start_time
+         n_calls += 1
+         n_placements += len(placements)
+         if game.step(names[action]):
+            break
+   print(f"placements:    {n_calls / elapsed:12.0f} enumerations/s "
+         f"({n_placements / n_calls:.1f} placements each)")
+   return n_calls / elapsed
+
+# A function for measuring the time the AI player takes in each frame with
+# the time budget of a frame (see Tetris_2048.AI_TIME_BUDGET), where its
+# search of each move is spread over at most the given number of frames (30
+# frames pass between the logic ticks of the first level at 60 frames per
+# second), the depth its searches reach, its transposition table hits and the
+# score it reaches in the given number of pieces
+def benchmark_agent(n_pieces=100, time_budget=0.5 / 60, frames=30, grid_h=20, grid_w=12,
+                    seed=0):
+   agent = ExpectimaxAgent(time_budget=time_budget)
+   game = TetrisGame(grid_h, grid_w, seed, packed=True)
+   times, depths, table_hits = [], [], 0
+   while not game.game_over and game.pieces_placed < n_pieces:
+      for frame in range(frames):
+         start_time = time.perf_counter()
+         complete = agent.search(game)
+         times.append(time.perf_counter() - start_time)
+         if complete:
+            break
+      depths.append(agent.depth)
+      table_hits += agent.table_hits
+      for action in agent.plan(game):
+         game.act(action)
+      game.tick()
+   print(f"agent:         {np.mean(times) * 1e3:12.1f} ms/frame "
+         f"(max {np.max(times) * 1e3:.1f} ms, depth {np.mean(depths):.2f}, "
+         f"{table_hits} table hits, score {game.grid.score} in {game.pieces_placed} pieces)")
+   return np.mean(times)
+
+# A function for measuring how many environment steps per second a vector
+# environment of n_envs games makes with random actions
+def benchmark_env(n_envs=16, n_steps=500, grid_h=20, grid_w=12, seed=0):
+   rng = np.random.default_rng(seed)
+   envs = VectorEnv(n_envs, grid_h, grid_w)
+   envs.reset(seed)
+   actions = rng.integers(0, len(ENV_ACTIONS), size=(n_steps, n_envs))
+   start_time = time.perf_counter()
+   for step_actions in actions:
+      envs.step(step_actions)
+   elapsed = time.perf_counter() - start_time
+   print(f"env:           {n_envs * n_steps / elapsed:12.0f} steps/s "
+         f"({n_envs} environments)")
+   return n_envs * n_steps / elapsed
+
+# run the benchmarks when this file is executed as a script
+if __name__ == '__main__':
+   benchmark_batch()
+   benchmark_replay()
+   benchmark_lock()
+   benchmark_placements()
+   benchmark_agent()
+   benchmark_env()
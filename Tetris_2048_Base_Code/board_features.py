@@ -0,0 +1,105 @@
+################################################################################
+#                                                                              #
+# A vectorized extractor of the features of game boards for the heuristics     #
+# and the learning of the automated players                                    #
+#                                                                              #
+################################################################################
+
+from collections import namedtuple  # used for the features
+import numpy as np  # the fundamental Python module for scientific computing
+
+# The features of one board or of each board of a batch (as arrays with the
+# batch as the first axis):
+#   column_heights      the height of each column (W values per board)
+#   aggregate_height    the sum of the column heights
+#   max_height          the height of the highest column
+#   holes               the empty cells below the top of their columns
+#   bumpiness           the sum of the height differences of adjacent columns
+#   row_transitions     the changes between occupied and empty cells along
+#                       the rows, where the side walls count as occupied
+#   column_transitions  the changes between occupied and empty cells along
+#                       the columns, where the floor counts as occupied
+#   wells               the sum of 1 + 2 + ... + depth over the wells (the
+#                       columns lower than both of their neighbours, where
+#                       the side walls are as high as the grid)
+#   equal_pairs         the horizontally or vertically adjacent pairs of
+#                       tiles with equal values
+#   max_tile            the largest tile value (0 for an empty board)
+#   max_tile_row        the row and the column of the largest tile (its
+#   max_tile_col        lowest, then leftmost cell; 0 for an empty board)
+#   monotonicity        the sum over the rows and the columns of the smaller
+#                       of the total increase and the total decrease of the
+#                       exponents along them (0 when every row and column is
+#                       monotone, as the 2048 strategies prefer)
+BoardFeatures = namedtuple('BoardFeatures', [
+   'column_heights', 'aggregate_height', 'max_height', 'holes', 'bumpiness',
+   'row_transitions', 'column_transitions', 'wells', 'equal_pairs',
+   'max_tile', 'max_tile_row', 'max_tile_col', 'monotonicity'])
+
+# The names of the features with a single value per board, in the order of
+# the columns of feature_matrix
+SCALAR_FEATURES = BoardFeatures._fields[1:]
+
+# A function that computes the features of one board, an (H, W) array of log2
+# exponents in the layout of GameGrid (row 0 at the bottom, 0 = empty, e.g.
+# GameGrid.get_exponent_matrix), or of a batch of boards as an (N, H, W)
+# array, with one pass of NumPy operations over the whole batch (e.g. for
+# scoring every candidate placement with one call)
+def board_features(boards):
+   boards = np.asarray(boards)
+   single = boards.ndim == 2
+   if single:
+      boards = boards[np.newaxis]
+   n, height, width = boards.shape
+   occupied = boards != 0
+   # the heights of the columns from their topmost occupied cells
+   tops = height - np.argmax(occupied[:, ::-1, :], axis=1)
+   heights = np.where(occupied.any(axis=1), tops, 0)
+   aggregate_height = heights.sum(axis=1)
+   holes = aggregate_height - occupied.sum(axis=(1, 2))
+   bumpiness = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+   # the transitions, with the walls and the floor padded as occupied cells
+   walls = np.ones((n, height, 1), dtype=bool)
+   rows = np.concatenate((walls, occupied, walls), axis=2)
+   row_transitions = (rows[:, :, 1:] != rows[:, :, :-1]).sum(axis=(1, 2))
+   columns = np.concatenate((np.ones((n, 1, width), dtype=bool), occupied), axis=1)
+   column_transitions = (columns[:, 1:] != columns[:, :-1]).sum(axis=(1, 2))
+   # the depths of the wells below the lower of the neighbouring columns
+   wall_heights = np.full((n, 1), height)
+   left = np.concatenate((wall_heights, heights[:, :-1]), axis=1)
+   right = np.concatenate((heights[:, 1:], wall_heights), axis=1)
+   depths = np.clip(np.minimum(left, right) - heights, 0, None)
+   wells = (depths * (depths + 1) // 2).sum(axis=1)
+   # the adjacent equal tiles (the vertical ones merge on the next update)
+   equal_pairs = (((boards[:, :, 1:] == boards[:, :, :-1]) & occupied[:, :, 1:]).sum(axis=(1, 2)) +
+                  ((boards[:, 1:] == boards[:, :-1]) & occupied[:, 1:]).sum(axis=(1, 2)))
+   # the largest tile and its position
+   flat = boards.reshape(n, -1)
+   max_index = np.argmax(flat, axis=1)
+   max_exponent = flat[np.arange(n), max_index].astype(np.int64)
+   max_tile = np.where(max_exponent > 0, np.left_shift(1, max_exponent), 0)
+   max_tile_row, max_tile_col = np.divmod(max_index, width)
+   # the monotonicity of the exponents along the rows and the columns: the
+   # total increase minus the total decrease along a line is its last minus
+   # its first exponent, so the smaller of them is half the total change
+   # less the absolute net change
+   exponents = boards.astype(np.int16)
+   monotonicity = np.zeros(n, dtype=np.int64)
+   for axis in (1, 2):
+      change = np.abs(np.diff(exponents, axis=axis)).sum(axis=axis)
+      net = np.take(exponents, -1, axis=axis) - np.take(exponents, 0, axis=axis)
+      monotonicity += ((change - np.abs(net)) // 2).sum(axis=1)
+   features = BoardFeatures(heights, aggregate_height, heights.max(axis=1), holes,
+                            bumpiness, row_transitions, column_transitions, wells,
+                            equal_pairs, max_tile, max_tile_row, max_tile_col,
+                            monotonicity)
+   if single:
+      return BoardFeatures(*(feature[0] for feature in features))
+   return features
+
+# A function that returns the features with a single value per board (see
+# SCALAR_FEATURES) as an (N, F) float array for the learning of the players
+# (an (F,) array for the features of one board)
+def feature_matrix(features):
+   return np.stack([np.asarray(getattr(features, name), dtype=np.float64)
+                    for name in SCALAR_FEATURES], axis=-1)
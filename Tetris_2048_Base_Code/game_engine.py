@@ -0,0 +1,175 @@
+################################################################################
+#                                                                              #
+# The headless game engine of Tetris 2048: the game rules without any drawing  #
+#                                                                              #
+################################################################################
+
+from game_grid import GameGrid  # the class for modeling the game grid
+from tetromino import Tetromino  # the class for modeling the tetrominoes
+# the seeded generator of the tetrominoes and the types it draws from
+from piece_generator import PieceGenerator, TETROMINO_TYPES
+import random  # used for creating tetrominoes with random types (shapes)
+import numpy as np  # used for saving the snapshots as .npy files
+import struct  # used for packing the snapshots of the games
+
+# The actions that can be applied to the active tetromino (named after the
+# keys used for them in the game)
+ACTIONS = ("left", "right", "down", "up", "space")
+
+# The gravity (the auto fall speed of the active tetromino in cells per
+# second) at each level; the levels above the table keep its last value
+GRAVITY = (2.0, 2.5, 3.0, 3.75, 4.5, 5.5, 6.5, 8.0, 10.0, 12.5, 15.0, 20.0)
+# The number of full rows to clear for advancing to the next level
+LINES_PER_LEVEL = 10
+
+# The fixed size part of a snapshot of a game (see TetrisGame.snapshot): the
+# magic bytes, the format version, the grid height and width, whether the
+# grid is packed, the number of placed tetrominoes and the game over flag
+SNAPSHOT_MAGIC = b"T2KS"
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<4sBHHBqB")
+
+# A function for creating random shaped tetrominoes to enter the game grid,
+# where the random values are drawn from the given random number generator
+def create_tetromino(rng=random):
+   # the type (shape) of the tetromino is determined randomly
+   random_index = rng.randint(0, len(TETROMINO_TYPES) - 1)
+   random_type = TETROMINO_TYPES[random_index]
+   # create and return the tetromino
+   tetromino = Tetromino(random_type, rng)
+   return tetromino
+
+# A class for modeling a game of Tetris 2048 that is stepped by actions; it
+# does not import stddraw (pygame), open a window or sleep, so it can be used
+# for simulations as well as by the renderer in Tetris_2048.start
+class TetrisGame:
+   # A constructor for creating a game on a grid with the given dimensions,
+   # where the tetrominoes are drawn by a piece generator seeded with seed
+   # (see piece_generator for the modes), so the same seed and actions always
+   # give the same game
+   def __init__(self, grid_h=20, grid_w=12, seed=None, packed=False,
+                piece_mode="uniform"):
+      self.seed = seed
+      self.pieces = PieceGenerator(grid_w, seed, piece_mode)
+      # set the game grid dimension values stored and used in the Tetromino class
+      Tetromino.grid_height = grid_h
+      Tetromino.grid_width = grid_w
+      # create the game grid and the first two tetrominoes
+      self.grid = GameGrid(grid_h, grid_w, packed)
+      self.current_tetromino = self.pieces.next_tetromino()
+      self.next_tetromino = self.pieces.next_tetromino()
+      self.grid.current_tetromino = self.current_tetromino
+      self.pieces_placed = 0  # the number of tetrominoes locked onto the grid
+      self.game_over = False
+
+   # A method that returns the state of the game as a flat byte buffer: a
+   # fixed size header followed by the snapshots of the grid, the piece
+   # generator (including its random stream) and the current and the next
+   # tetrominoes. The same state is restored by restore or from_snapshot.
+   def snapshot(self):
+      header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                     self.grid.grid_height, self.grid.grid_width,
+                                     self.grid.packed, self.pieces_placed, self.game_over)
+      return b"".join((header, self.grid.snapshot(), self.pieces.snapshot(),
+                       self.current_tetromino.snapshot(), self.next_tetromino.snapshot()))
+
+   # A method for restoring the state saved by snapshot from the given buffer
+   # (any object supporting the buffer protocol, e.g. a memory-mapped array)
+   def restore(self, buffer):
+      magic, version, grid_h, grid_w, packed, pieces_placed, game_over = \
+         _SNAPSHOT_HEADER.unpack_from(buffer)
+      if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+         raise ValueError("not a game snapshot of a supported version")
+      Tetromino.grid_height = grid_h
+      Tetromino.grid_width = grid_w
+      grid = getattr(self, "grid", None)
+      if grid is None or (grid.grid_height, grid.grid_width, grid.packed) != (grid_h, grid_w, packed):
+         self.grid = GameGrid(grid_h, grid_w, bool(packed))
+      offset = self.grid.restore(buffer, _SNAPSHOT_HEADER.size)
+      self.pieces = PieceGenerator.__new__(PieceGenerator)
+      offset = self.pieces.restore(buffer, offset)
+      self.seed = self.pieces.seed
+      self.current_tetromino = Tetromino.from_snapshot(buffer, offset)
+      self.next_tetromino = Tetromino.from_snapshot(buffer, offset + Tetromino.snapshot_layout.size)
+      self.grid.current_tetromino = self.current_tetromino
+      self.pieces_placed = pieces_placed
+      self.game_over = bool(game_over)
+
+   # A class method that creates a game from a snapshot (see restore)
+   @classmethod
+   def from_snapshot(cls, buffer):
+      game = cls.__new__(cls)
+      game.restore(buffer)
+      return game
+
+   # A method that returns the level of the game, which starts from 0 and
+   # advances after every LINES_PER_LEVEL cleared rows
+   def level(self):
+      return self.grid.lines_cleared // LINES_PER_LEVEL
+
+   # A method that returns the gravity at the level of the game (in cells per
+   # second), i.e. how many times per second tick is called in real time play
+   def gravity(self):
+      return GRAVITY[min(self.level(), len(GRAVITY) - 1)]
+
+   # A method that returns the k pieces (see piece_generator.Piece) coming
+   # after the next tetromino, without taking them
+   def preview(self, k):
+      return self.pieces.peek(k)
+
+   # A method for applying an action (see ACTIONS) to the active tetromino;
+   # None and unknown actions are ignored
+   def act(self, action):
+      if self.game_over:
+         return
+      if action == "left" or action == "right" or action == "down":
+         self.current_tetromino.move(action, self.grid)
+      elif action == "up":
+         self.current_tetromino.rotate(self.grid)
+      elif action == "space":
+         self.current_tetromino.hard_drop(self.grid)
+
+   # A method for moving the active tetromino down by one (auto fall); when it
+   # cannot go down anymore it is locked onto the grid and the next tetromino
+   # enters the grid. Returns True when the game is over.
+   def tick(self):
+      if self.game_over:
+         return True
+      if self.current_tetromino.move("down", self.grid):
+         return False
+      # get the tile matrix of the tetromino without empty rows and columns
+      # and the position of the bottom left cell in this matrix
+      tiles, pos = self.current_tetromino.get_min_bounded_tile_matrix(True)
+      # update the game grid by locking the tiles of the landed tetromino
+      self.game_over = self.grid.update_grid(tiles, pos)
+      self.pieces_placed += 1
+      if self.game_over:
+         return True
+      # the next tetromino becomes the active one and a new next is created
+      self.current_tetromino = self.next_tetromino
+      self.next_tetromino = self.pieces.next_tetromino()
+      self.grid.current_tetromino = self.current_tetromino
+      return False
+
+   # A method for running one iteration of the game loop: the given action
+   # (if any) followed by the auto fall. Returns True when the game is over.
+   def step(self, action=None):
+      self.act(action)
+      return self.tick()
+
+   # A method for stepping the game with each action in the given sequence
+   # until the sequence ends or the game is over
+   def run(self, actions):
+      for action in actions:
+         if self.step(action):
+            break
+      return self
+
+# A function for saving a snapshot of the given game to a .npy file (a flat
+# uint8 array), which load_snapshot can memory-map instead of reading it
+def save_snapshot(path, game):
+   np.save(path, np.frombuffer(game.snapshot(), dtype=np.uint8))
+
+# A function for creating a game from a snapshot saved by save_snapshot
+def load_snapshot(path):
+   return TetrisGame.from_snapshot(np.load(path, mmap_mode='r'))
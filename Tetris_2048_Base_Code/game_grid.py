@@ -1,13 +1,119 @@
-import lib.stddraw as stddraw
 from lib.color import Color
 from point import Point
+from tile import Tile
 import numpy as np
+import struct
+
+# Converts a tile value (2, 4, 8, ...) to its log2 exponent (1, 2, 3, ...)
+def value_to_exponent(number):
+    return int(number).bit_length() - 1
+
+# Converts a log2 exponent back to the tile value it encodes
+def exponent_to_value(exponent):
+    return 1 << int(exponent)
+
+# Merges the columns of an (H, C) exponent array in place with the same rules
+# as GameGrid._merge_tiles, processing all the columns together: every row is
+# pushed onto (or merged into) the top of each column stack with one vectorized
+# step. Returns the merge score gained in each column.
+def merge_exponent_columns(columns):
+    height, n_cols = columns.shape
+    scores = np.zeros(n_cols, dtype=np.int64)
+    occupied_rows = np.flatnonzero(columns.any(axis=1))
+    if len(occupied_rows) == 0:
+        return scores
+    col_index = np.arange(n_cols)
+    top = np.zeros(n_cols, dtype=np.intp)  # the top of each column stack
+    merged = np.zeros_like(columns)
+    merged[0] = columns[0]
+    # empty rows above the highest tile cannot change anything
+    for row in range(1, occupied_rows[-1] + 1):
+        incoming = columns[row]
+        current = merged[top, col_index]
+        merge = (incoming != 0) & (incoming == current)
+        if merge.any():
+            merged[top[merge], col_index[merge]] += 1
+            scores[merge] += np.left_shift(1, current[merge].astype(np.int64) + 1)
+        push = ~merge
+        top[push] += 1
+        merged[top[push], col_index[push]] = incoming[push]
+    columns[:] = merged
+    return scores
+
+# Merges one column given as a list of exponents (bottom to top) with the same
+# rules as merge_exponent_columns; returns the merged column and the score
+# gained. For the few columns touched by a locked tetromino this is much
+# faster than the vectorized version, which steps through all the rows.
+def merge_exponent_list(column):
+    stack, score = [], 0
+    for exponent in column:
+        if exponent and stack and stack[-1] == exponent:
+            stack[-1] += 1
+            score += 1 << (exponent + 1)
+        else:
+            stack.append(exponent)
+    return stack + [0] * (len(column) - len(stack)), score
+
+# The seed of the Zobrist keys, fixed so that the hashes of the boards (see
+# GameGrid.zobrist_hash) are the same in every process and every run
+ZOBRIST_SEED = 0x2048
+# the Zobrist keys of the grids of each size (see zobrist_keys)
+_zobrist_tables = {}
+
+# Returns the Zobrist keys of a grid with the given dimensions: an (H, W, 256)
+# array of random 64-bit keys, one for each exponent a cell can hold, where
+# the key of an empty cell (exponent 0) is 0
+def zobrist_keys(grid_h, grid_w):
+    keys = _zobrist_tables.get((grid_h, grid_w))
+    if keys is None:
+        rng = np.random.default_rng([ZOBRIST_SEED, grid_h, grid_w])
+        keys = rng.integers(0, 1 << 64, size=(grid_h, grid_w, 256), dtype=np.uint64)
+        keys[:, :, 0] = 0
+        _zobrist_tables[(grid_h, grid_w)] = keys
+    return keys
+
+# Returns the Zobrist hash of the given exponent array (the XOR of the keys
+# of its cells) computed from scratch
+def zobrist_hash(exponents, keys):
+    rows, cols = np.nonzero(exponents)
+    return int(np.bitwise_xor.reduce(keys[rows, cols, exponents[rows, cols]]))
+
+# Returns the height of each column (the row index of its topmost occupied
+# cell plus one, 0 for an empty column) of the given occupancy array
+def column_heights(occupancy):
+    height = occupancy.shape[0]
+    tops = height - np.argmax(occupancy[::-1], axis=0)
+    return np.where(occupancy.any(axis=0), tops, 0)
 
 class GameGrid:
-    def __init__(self, grid_h, grid_w):
+    # the name of the stddraw layer holding the empty grid and its lines
+    background_layer = "game_grid_background"
+    # the fixed size part of a snapshot (see snapshot): the grid height and
+    # width, the score, the number of cleared rows and the game over flag
+    snapshot_header = struct.Struct("<HHqqB")
+    # when True, display repaints only the cells that changed since the
+    # previous frame (for stddraw's dirty rectangle mode, see Tetris_2048.start)
+    repaint_changes_only = False
+    # the packed merges of at most this many columns (e.g. the columns of a
+    # locked tetromino) are done column by column with merge_exponent_list
+    list_merge_columns = 4
+    # when True, the incrementally updated Zobrist hash is checked against a
+    # hash computed from scratch after each update of the grid (slow, for
+    # debugging)
+    verify_hash = False
+
+    def __init__(self, grid_h, grid_w, packed=False):
         self.grid_height = grid_h
         self.grid_width = grid_w
-        self.tile_matrix = np.full((grid_h, grid_w), None)
+        # in packed mode the board is a compact uint8 array of log2 exponents
+        # (0 means empty) and Tile objects are only created when drawing
+        self.packed = packed
+        if packed:
+            self.tile_matrix = None
+            self.exponent_matrix = np.zeros((grid_h, grid_w), dtype=np.uint8)
+        else:
+            self.tile_matrix = np.full((grid_h, grid_w), None)
+            self.exponent_matrix = None
         self.current_tetromino = None
         self.game_over = False
         self.empty_cell_color = Color(42, 69, 99)
@@ -16,24 +122,119 @@ class GameGrid:
         self.line_thickness = 0.002
         self.box_thickness = 10 * self.line_thickness
         self.score = 0
+        self.lines_cleared = 0  # the number of full rows cleared so far
+        # bookkeeping for the incremental merge/clear done by update_grid: the
+        # number of tiles in each row and, for each column that may still hold
+        # equal vertically adjacent tiles, the lowest row to re-examine
+        self.row_counts = np.zeros(grid_h, dtype=np.int64)
+        self.pending_merges = {}
+        # bitboard of the grid used for fast collision checks: one Python int
+        # per row where bit col is set when the cell (row, col) is occupied
+        self.row_masks = [0] * grid_h
+        # height profile of the columns used for the one step hard drop
+        self.column_heights = np.zeros(grid_w, dtype=np.int64)
+        # the 64-bit Zobrist hash of the board (the tile values in the cells,
+        # not the score or the active tetromino), updated incrementally by
+        # each lock, merge and row clear, e.g. for use as a cache key
+        self.zobrist_keys = zobrist_keys(grid_h, grid_w)
+        self.zobrist_hash = 0
+        # the displayed cells (see get_frame) and score of the previous frame,
+        # and the number of cells repainted by the last call of display
+        self.last_frame = None
+        self.last_score = None
+        self.repainted_cells = 0
+
+    # Rebuilds the incremental bookkeeping from scratch; must be called after
+    # the board is modified directly instead of through update_grid
+    def invalidate(self):
+        occupancy = self.get_occupancy()
+        self.row_counts = occupancy.sum(axis=1).astype(np.int64)
+        self.pending_merges = {col: 0 for col in range(self.grid_width)}
+        weights = np.left_shift(1, np.arange(self.grid_width, dtype=np.int64))
+        self.row_masks = (occupancy @ weights).tolist()
+        self.column_heights = column_heights(occupancy)
+        self.zobrist_hash = zobrist_hash(self.get_exponent_matrix(), self.zobrist_keys)
 
     def display(self):
-        stddraw.clear(self.empty_cell_color)
-        self.draw_grid()
-        if self.current_tetromino is not None:
-            self.current_tetromino.draw()
-        self.draw_boundaries()
-        stddraw.show(250)
+        import lib.stddraw as stddraw  # only needed for drawing
+        # the empty grid with its lines does not change between frames, so it
+        # is rendered once into a cached offscreen layer that is blitted here
+        if not stddraw.hasLayer(GameGrid.background_layer):
+            stddraw.beginLayer(GameGrid.background_layer)
+            stddraw.clear(self.empty_cell_color)
+            self.draw_grid_lines()
+            stddraw.endLayer()
+            self.last_frame = None  # the canvas must be repainted entirely
+        frame = self.get_frame()
+        if GameGrid.repaint_changes_only and self.last_frame is not None:
+            self.repaint_cells(frame)
+        else:
+            stddraw.drawLayer(GameGrid.background_layer)
+            self.draw_grid()
+            if self.current_tetromino is not None:
+                self.current_tetromino.draw()
+            self.draw_boundaries()
+            self.repainted_cells = self.grid_height * self.grid_width
+            self.last_score = None  # the score text is painted over too
+        self.last_frame = frame
+        if GameGrid.repaint_changes_only and self.score == self.last_score:
+            return  # the displayed score is still up to date
+        if self.last_score is not None:
+            # erase the previous score text by restoring the background
+            stddraw.drawLayer(GameGrid.background_layer, self.grid_width,
+                              self.grid_height - 1.5, 5.5, 1)
+        self.last_score = self.score
         stddraw.setPenColor(Color(255, 255, 255))  # Beyaz renk
         stddraw.setFontFamily("Arial")
         stddraw.setFontSize(18)
         stddraw.text(self.grid_width + 2, self.grid_height - 1, f"Score: {self.score}")
 
+    # Returns the displayed cells as an exponent array (0 = empty) holding the
+    # tiles of the grid and the visible tiles of the current tetromino
+    def get_frame(self):
+        frame = self.get_exponent_matrix().copy()
+        tetromino = self.current_tetromino
+        if tetromino is not None:
+            n = len(tetromino.tile_matrix)
+            for row in range(n):
+                for col in range(n):
+                    tile = tetromino.tile_matrix[row][col]
+                    if tile is not None:
+                        position = tetromino.get_cell_position(row, col)
+                        if 0 <= position.y < self.grid_height:
+                            frame[position.y, position.x] = value_to_exponent(tile.number)
+        return frame
+
+    # Repaints only the cells whose contents differ between the previous frame
+    # and the given frame (see get_frame); each one is restored from the
+    # background layer and its tile (if any) is drawn on it again
+    def repaint_cells(self, frame):
+        import lib.stddraw as stddraw  # only needed for drawing
+        rows, cols = np.nonzero(frame != self.last_frame)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            stddraw.drawLayer(GameGrid.background_layer, col - 0.5, row - 0.5, 1, 1)
+            if frame[row, col] != 0:
+                Tile(exponent_to_value(frame[row, col])).draw(Point(col, row))
+        self.repainted_cells = len(rows)
+        # the boundaries overlap the cells on the edges of the grid
+        if len(rows) > 0 and (rows.min() == 0 or cols.min() == 0 or
+                              rows.max() == self.grid_height - 1 or
+                              cols.max() == self.grid_width - 1):
+            self.draw_boundaries()
+
+    # Draws the tiles on the grid (only the occupied cells are visited)
     def draw_grid(self):
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                if self.tile_matrix[row][col] is not None:
-                    self.tile_matrix[row][col].draw(Point(col, row))
+        rows, cols = np.nonzero(self.get_occupancy())
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            if self.packed:
+                # create the tiles of the packed board only for rendering
+                number = exponent_to_value(self.exponent_matrix[row, col])
+                Tile(number).draw(Point(col, row))
+            else:
+                self.tile_matrix[row][col].draw(Point(col, row))
+
+    def draw_grid_lines(self):
+        import lib.stddraw as stddraw  # only needed for drawing
         stddraw.setPenColor(self.line_color)
         stddraw.setPenRadius(self.line_thickness)
         start_x, end_x = -0.5, self.grid_width - 0.5
@@ -45,6 +246,7 @@ class GameGrid:
         stddraw.setPenRadius()
 
     def draw_boundaries(self):
+        import lib.stddraw as stddraw  # only needed for drawing
         stddraw.setPenColor(self.boundary_color)
         stddraw.setPenRadius(self.box_thickness)
         stddraw.rectangle(-0.5, -0.5, self.grid_width, self.grid_height)
@@ -53,69 +255,332 @@ class GameGrid:
     def is_occupied(self, row, col):
         if not self.is_inside(row, col):
             return False
+        if self.packed:
+            return self.exponent_matrix[row, col] != 0
         return self.tile_matrix[row][col] is not None
 
     def is_inside(self, row, col):
         return 0 <= row < self.grid_height and 0 <= col < self.grid_width
 
+    # Returns the state of the grid as a flat byte buffer: snapshot_header
+    # followed by the board as a row-major exponent array (0 = empty), so
+    # the Tile objects are never copied
+    def snapshot(self):
+        header = GameGrid.snapshot_header.pack(self.grid_height, self.grid_width,
+                                               self.score, self.lines_cleared,
+                                               self.game_over)
+        return header + self.get_exponent_matrix().tobytes()
+
+    # Restores the state saved by snapshot from the given buffer (any object
+    # supporting the buffer protocol, e.g. a memory-mapped array) starting at
+    # offset into this grid of the same dimensions; returns the offset of the
+    # first byte after the snapshot
+    def restore(self, buffer, offset=0):
+        h, w, score, lines_cleared, game_over = GameGrid.snapshot_header.unpack_from(buffer, offset)
+        if (h, w) != (self.grid_height, self.grid_width):
+            raise ValueError("the snapshot is of a grid with other dimensions")
+        offset += GameGrid.snapshot_header.size
+        board = np.frombuffer(buffer, dtype=np.uint8, count=h * w, offset=offset).reshape(h, w)
+        if self.packed:
+            self.exponent_matrix[:] = board
+        else:
+            self.tile_matrix = np.full((h, w), None)
+            rows, cols = np.nonzero(board)
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                self.tile_matrix[row, col] = Tile(exponent_to_value(board[row, col]))
+        self.score = score
+        self.lines_cleared = lines_cleared
+        self.game_over = bool(game_over)
+        self.invalidate()
+        return offset + h * w
+
+    # Returns the change of the Zobrist hash of the board when the given
+    # exponent block (of the rows from row_start on and the given columns,
+    # all of them by default) changes from before to after
+    def _zobrist_change(self, row_start, before, after, cols=None):
+        rows, block_cols = np.nonzero(before != after)
+        if len(rows) == 0:
+            return 0
+        grid_rows = rows + row_start
+        grid_cols = block_cols if cols is None else cols[block_cols]
+        keys = self.zobrist_keys
+        return int(np.bitwise_xor.reduce(keys[grid_rows, grid_cols, before[rows, block_cols]]) ^
+                   np.bitwise_xor.reduce(keys[grid_rows, grid_cols, after[rows, block_cols]]))
+
+    # Raises an AssertionError when the incrementally updated Zobrist hash
+    # differs from the hash of the board computed from scratch
+    def check_hash(self):
+        expected = zobrist_hash(self.get_exponent_matrix(), self.zobrist_keys)
+        if self.zobrist_hash != expected:
+            raise AssertionError(f"Zobrist hash {self.zobrist_hash:#x} does not "
+                                 f"match the board ({expected:#x})")
+
+    # Returns a boolean array marking the occupied cells of the grid
+    def get_occupancy(self):
+        if self.packed:
+            return self.exponent_matrix != 0
+        return self.tile_matrix != None  # elementwise comparison on objects
+
+    # Returns the board as an integer array of log2 exponents (0 = empty);
+    # in packed mode this is the underlying array itself, not a copy
+    def get_exponent_matrix(self):
+        if self.packed:
+            return self.exponent_matrix
+        exponents = np.zeros((self.grid_height, self.grid_width), dtype=np.uint8)
+        rows, cols = np.nonzero(self.get_occupancy())
+        for row, col in zip(rows, cols):
+            exponents[row, col] = value_to_exponent(self.tile_matrix[row, col].number)
+        return exponents
+
+    # Returns the exponents of the rows in [start, stop) of the board
+    def get_exponent_rows(self, start, stop):
+        if self.packed:
+            return self.exponent_matrix[start:stop]
+        rows = self.tile_matrix[start:stop]
+        exponents = np.zeros(rows.shape, dtype=np.uint8)
+        for (row, col), tile in np.ndenumerate(rows):
+            if tile is not None:
+                exponents[row, col] = value_to_exponent(tile.number)
+        return exponents
+
+    # Locks the given tiles onto the grid, then merges and clears rows only
+    # where something could change: the columns and rows touched by the locked
+    # tiles, plus the columns left with equal adjacent tiles by earlier updates
     def update_grid(self, tiles_to_lock, blc_position):
-        self.current_tetromino = None
-        # Lock new tiles onto the grid
         n_rows, n_cols = len(tiles_to_lock), len(tiles_to_lock[0])
+        cells = []
         for col in range(n_cols):
             for row in range(n_rows):
-                if tiles_to_lock[row][col] is not None:
-                    pos = Point()
-                    pos.x = blc_position.x + col
-                    pos.y = blc_position.y + (n_rows - 1) - row
-                    if self.is_inside(pos.y, pos.x):
-                        self.tile_matrix[pos.y][pos.x] = tiles_to_lock[row][col]
-                    else:
-                        self.game_over = True
+                tile = tiles_to_lock[row][col]
+                if tile is not None:
+                    x = blc_position.x + col
+                    y = blc_position.y + (n_rows - 1) - row
+                    cells.append((y, x, tile))
+        return self.lock_cells(cells)
+
+    # Locks the given (row, col, tile) cells onto the grid like update_grid,
+    # where each tile is a Tile or, on a packed grid, a log2 exponent (so
+    # simulations can lock pieces without creating Tile objects)
+    def lock_cells(self, cells):
+        self.current_tetromino = None
+        # columns to merge mapped to the lowest row that needs re-examining
+        dirty_columns = self.pending_merges
+        self.pending_merges = {}
+        # Lock new tiles onto the grid
+        keys = self.zobrist_keys
+        for y, x, tile in cells:
+            if self.is_inside(y, x):
+                if not self.is_occupied(y, x):
+                    self.row_counts[y] += 1
+                    self.row_masks[y] |= 1 << x
+                    if self.column_heights[x] <= y:
+                        self.column_heights[x] = y + 1
+                    old_exponent = 0
+                elif self.packed:
+                    old_exponent = self.exponent_matrix[y, x]
+                else:
+                    old_exponent = value_to_exponent(self.tile_matrix[y][x].number)
+                exponent = tile if not isinstance(tile, Tile) else value_to_exponent(tile.number)
+                self.zobrist_hash ^= int(keys[y, x, old_exponent] ^ keys[y, x, exponent])
+                if self.packed:
+                    self.exponent_matrix[y, x] = exponent
+                else:
+                    # the tile is handed over to the grid, not copied
+                    self.tile_matrix[y][x] = tile
+                # the new tile may merge with the tile below it
+                start = max(y - 1, 0)
+                dirty_columns[x] = min(dirty_columns.get(x, start), start)
+            else:
+                self.game_over = True
         # Perform merges before clearing rows
-        self._merge_tiles()
-        # Clear any full rows
+        self._merge_tiles(dirty_columns)
+        # Clear any full rows (found from the row counts without a board scan)
         self._clear_full_rows()
-        
+        if GameGrid.verify_hash:
+            self.check_hash()
+
         return self.game_over
 
-    def _merge_tiles(self):
-        # Merge vertically in each column, bottom-to-top, allowing chains
-        for col in range(self.grid_width):
-            row = 0
-            while row < self.grid_height - 1:
-                bottom = self.tile_matrix[row][col]
-                top = self.tile_matrix[row+1][col]
-                if bottom and top and bottom.number == top.number:
+    # Returns a packed copy of the board, score and bookkeeping of the grid
+    # (without the active tetromino or the drawing state) for simulations,
+    # e.g. the look-ahead search of agent.ExpectimaxAgent
+    def copy(self):
+        grid = GameGrid(self.grid_height, self.grid_width, packed=True)
+        grid.exponent_matrix[:] = self.get_exponent_matrix()
+        grid.game_over = self.game_over
+        grid.score = self.score
+        grid.lines_cleared = self.lines_cleared
+        grid.row_counts = self.row_counts.copy()
+        grid.pending_merges = dict(self.pending_merges)
+        grid.row_masks = list(self.row_masks)
+        grid.column_heights = self.column_heights.copy()
+        grid.zobrist_hash = self.zobrist_hash
+        return grid
+
+    # Merges equal tiles vertically in each column, bottom-to-top, allowing
+    # chains; each column is handled as a stack in one linear pass where an
+    # incoming tile either doubles the tile on top of the stack or is pushed.
+    # Only the given columns (mapped to the row to start from) are merged, all
+    # of them by default.
+    def _merge_tiles(self, columns=None):
+        if columns is None:
+            columns = {col: 0 for col in range(self.grid_width)}
+        if not columns:
+            return
+        if self.packed:
+            self._merge_exponent_block(columns)
+            return
+        for col, start in columns.items():
+            column = self.tile_matrix[start:, col]  # a view of the column
+            below_start = self.tile_matrix[start - 1, col] if start > 0 else None
+            # the exponents of the column before its first merge (the merged
+            # tiles are doubled in place) for updating the hash
+            exponents = None
+            stack = [column[0]]
+            for tile in column[1:]:
+                bottom = stack[-1]
+                if bottom is not None and tile is not None and bottom.number == tile.number:
+                    if exponents is None:
+                        exponents = [value_to_exponent(tile.number) if tile is not None else 0
+                                     for tile in column]
                     # Merge into bottom
-                    merged_value = bottom.number * 2
-                    bottom.number = merged_value
+                    bottom.number *= 2
                     bottom.update_colors()
-                    self.score += merged_value  # merge puanı   
-                    # Shift everything above down
-                    for r in range(row+1, self.grid_height-1):
-                        self.tile_matrix[r][col] = self.tile_matrix[r+1][col]
-                    self.tile_matrix[self.grid_height-1][col] = None
-                    # Stay on this row for chain merges
+                    self.score += bottom.number  # merge puanı
+                    # the doubled tile may now equal the tile below it, which
+                    # this pass does not revisit (merged on the next update)
+                    below = stack[-2] if len(stack) > 1 else below_start
+                    if below is not None and below.number == bottom.number:
+                        residual_row = start + len(stack) - 2
+                        if col not in self.pending_merges:
+                            self.pending_merges[col] = residual_row
                 else:
-                    row += 1
+                    stack.append(tile)
+            # the merged tiles were removed, so the cells above become empty
+            if len(stack) < len(column):
+                before = column != None
+                for row, tile in enumerate(stack):
+                    column[row] = tile
+                column[len(stack):] = None
+                after = column != None
+                self.row_counts[start:] += after.astype(np.int64) - before
+                for row in np.flatnonzero(after != before).tolist():
+                    self.row_masks[start + row] ^= 1 << col
+                self.column_heights[col] = column_heights(
+                    self.tile_matrix[:, col:col + 1] != None)[0]
+                keys = self.zobrist_keys
+                for row, tile in enumerate(column):
+                    exponent = value_to_exponent(tile.number) if tile is not None else 0
+                    if exponent != exponents[row]:
+                        self.zobrist_hash ^= int(keys[start + row, col, exponents[row]] ^
+                                                 keys[start + row, col, exponent])
+
+    # Packed counterpart of the column loop in _merge_tiles: the dirty columns
+    # are merged together as one block by merge_exponent_columns, or one by
+    # one by _merge_exponent_lists when they are only a few
+    def _merge_exponent_block(self, columns):
+        if len(columns) <= GameGrid.list_merge_columns:
+            self._merge_exponent_lists(columns)
+            return
+        cols = np.fromiter(columns.keys(), dtype=np.intp, count=len(columns))
+        start = min(columns.values())
+        block = self.exponent_matrix[start:, cols]  # fancy indexing copies
+        before = block != 0
+        # tiles merge only with an equal tile right below them, so there is
+        # nothing to do (and nothing left pending) without such a pair
+        if not (before[1:] & (block[1:] == block[:-1])).any():
+            return
+        original = block.copy()
+        self.score += int(merge_exponent_columns(block).sum())
+        self.exponent_matrix[start:, cols] = block
+        self.zobrist_hash ^= self._zobrist_change(start, original, block, cols)
+        after = block != 0
+        self.row_counts[start:] += after.sum(axis=1) - before.sum(axis=1)
+        for row, i in zip(*np.nonzero(after != before)):
+            self.row_masks[start + int(row)] ^= 1 << int(cols[i])
+        self.column_heights[cols] = column_heights(self.exponent_matrix[:, cols] != 0)
+        # remember the columns left with equal adjacent tiles (the tile below
+        # the block may now equal the merged tile at the bottom of the block)
+        low = max(start - 1, 0)
+        block = self.exponent_matrix[low:, cols]
+        residual = (block[:-1] != 0) & (block[:-1] == block[1:])
+        for i in np.flatnonzero(residual.any(axis=0)):
+            self.pending_merges[int(cols[i])] = low + int(np.argmax(residual[:, i]))
 
+    # Merges the given few columns (e.g. the columns of a locked tetromino) of
+    # a packed grid one by one with merge_exponent_list and updates the
+    # bookkeeping of only the cells that changed (the NumPy calls of the block
+    # merge cost more than the work on so few cells)
+    def _merge_exponent_lists(self, columns):
+        matrix, keys = self.exponent_matrix, self.zobrist_keys
+        for col, start in columns.items():
+            column = matrix[start:, col].tolist()
+            merged, score = merge_exponent_list(column)
+            if score == 0:  # every merge scores, so nothing changed
+                continue
+            self.score += score
+            for row, (before, after) in enumerate(zip(column, merged), start):
+                if before != after:
+                    self.zobrist_hash ^= int(keys[row, col, before] ^ keys[row, col, after])
+                    if not before or not after:
+                        self.row_counts[row] += 1 if after else -1
+                        self.row_masks[row] ^= 1 << col
+            matrix[start:, col] = merged
+            # the merged tiles leave empty cells only on top of the column
+            while merged and not merged[-1]:
+                merged.pop()
+            self.column_heights[col] = start + len(merged)
+            # remember the lowest pair of equal adjacent tiles left in the
+            # column (a doubled tile may equal the tile right below it)
+            low = max(start - 1, 0)
+            cells = matrix[low:start + len(merged), col].tolist()
+            for row in range(len(cells) - 1):
+                if cells[row] and cells[row] == cells[row + 1]:
+                    self.pending_merges[col] = low + row
+                    break
+
+    # Clears every full row at once: the full rows are found by a single
+    # comparison of the row counts and the remaining rows are compacted
+    # downwards with a single mask-and-copy (works for both board modes)
     def _clear_full_rows(self):
-        row = 0
-        while row < self.grid_height:
-            if all(self.tile_matrix[row, c] is not None for c in range(self.grid_width)):
-                # PUAN EKLEMEK: Satırdaki taşların değerlerini topla
-                row_sum = sum(
-                    self.tile_matrix[row][c].number for c in range(self.grid_width) if self.tile_matrix[row][c] is not None
-                )
-                self.score += row_sum  # 👈 toplamı skora ekle
-
-                # Satırı temizle
-                self.tile_matrix[row, :] = [None] * self.grid_width
-                # Üst satırları aşağı kaydır
-                for r in range(row, self.grid_height - 1):
-                    self.tile_matrix[r, :] = self.tile_matrix[r + 1, :]
-                self.tile_matrix[self.grid_height - 1, :] = [None] * self.grid_width
-                # Aynı satırı tekrar kontrol et
-            else:
-                row += 1
\ No newline at end of file
+        full_rows = self.row_counts == self.grid_width
+        n_full = int(np.count_nonzero(full_rows))
+        if n_full == 0:
+            return 0
+        self.lines_cleared += n_full
+        # add the values of all the cleared tiles to the score in one pass
+        if self.packed:
+            cleared = self.exponent_matrix[full_rows].astype(np.int64)
+            self.score += int(np.sum(np.left_shift(1, cleared)))
+        else:
+            self.score += sum(tile.number for tile in self.tile_matrix[full_rows].flat)
+        # move the surviving rows down and empty the rows left on top (only
+        # the rows from the lowest full row on change)
+        lowest = int(np.argmax(full_rows))
+        before = self.get_exponent_rows(lowest, self.grid_height).copy()
+        board = self.exponent_matrix if self.packed else self.tile_matrix
+        survivors = board[~full_rows]  # boolean indexing makes a copy
+        board[:len(survivors)] = survivors
+        board[len(survivors):] = 0 if self.packed else None
+        self.zobrist_hash ^= self._zobrist_change(
+            lowest, before, self.get_exponent_rows(lowest, self.grid_height))
+        self.row_counts[:len(survivors)] = self.row_counts[~full_rows]
+        self.row_counts[len(survivors):] = 0
+        self.row_masks = [mask for mask, full in zip(self.row_masks, full_rows)
+                          if not full] + [0] * n_full
+        self.column_heights = column_heights(self.get_occupancy())
+        # the pending rows move down with the board (a lower bound suffices)
+        for col in self.pending_merges:
+            self.pending_merges[col] = max(self.pending_merges[col] - n_full, 0)
+        # rows on both sides of each cleared band are now adjacent, so the
+        # columns where they hold equal tiles must be merged on the next update
+        band_starts = np.flatnonzero(full_rows & ~np.concatenate(([False], full_rows[:-1])))
+        for band_start in band_starts:
+            below = int(np.count_nonzero(~full_rows[:band_start])) - 1
+            if below < 0 or below + 1 >= len(survivors):
+                continue
+            exponents = self.get_exponent_rows(below, below + 2)
+            equal = (exponents[0] != 0) & (exponents[0] == exponents[1])
+            for col in np.flatnonzero(equal).tolist():
+                self.pending_merges[col] = min(self.pending_merges.get(col, below), below)
+        return n_full
@@ -10,6 +10,8 @@ commonly used Color objects defined in the color module.
 import time
 import os
 import sys
+import functools
+import collections
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
 import pygame
@@ -82,6 +84,8 @@ _DEFAULT_PEN_COLOR = BLACK
 
 _DEFAULT_FONT_FAMILY = 'Helvetica'
 _DEFAULT_FONT_SIZE = 12
+_FONT_CACHE_SIZE = 32
+_SPRITE_CACHE_SIZE = 256
 
 _xmin = None
 _ymin = None
@@ -95,7 +99,38 @@ _canvasWidth = float(_DEFAULT_CANVAS_SIZE)
 _canvasHeight = float(_DEFAULT_CANVAS_SIZE)
 _penRadius = None
 _penColor = _DEFAULT_PEN_COLOR
-_keysTyped = []
+# The queue of the keys the user typed (including the automatic repeats of
+# the held keys, see setKeyRepeat), oldest first
+_keysTyped = collections.deque()
+
+# The queue of the timestamped key-down and key-up events (see
+# nextKeyEvent), oldest first; when it is full the oldest events are dropped
+_KEY_EVENT_QUEUE_SIZE = 1024
+_keyEvents = collections.deque(maxlen=_KEY_EVENT_QUEUE_SIZE)
+
+# The delayed auto shift and the auto repeat rate (in milliseconds) of the
+# keys that repeat while held (see setKeyRepeat), and the time of the next
+# repeat of each of these keys that is being held
+_repeatDelay = 0
+_repeatInterval = 0
+_repeatKeys = frozenset()
+_heldKeys = {}
+
+# Pre-rendered labeled squares (see labeledSquare), most recently used last
+_spriteCache = collections.OrderedDict()
+
+# Retained offscreen layers (see beginLayer) by name, and the surface that
+# drawing goes back to when the layer being drawn is ended
+_layers = {}
+_layerTarget = None
+
+# The pixel rectangles of the background canvas changed since the last show
+# when only these are copied to the window (see setDirtyRectMode), otherwise
+# None (the whole canvas is copied)
+_dirtyRects = None
+
+# The clock that paces the frames shown by showFrame
+_clock = pygame.time.Clock()
 
 # Has the window been created?
 _windowCreated = False
@@ -185,6 +220,8 @@ def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
     _surface = pygame.Surface((w, h))
     _surface.fill(_pygameColor(WHITE))
     _windowCreated = True
+    clearSpriteCache()
+    clearLayers()
 
 def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     """
@@ -200,6 +237,8 @@ def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     size = max - min
     _xmin = min - _BORDER * size
     _xmax = max + _BORDER * size
+    clearSpriteCache()
+    clearLayers()
 
 def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     """
@@ -215,6 +254,8 @@ def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     size = max - min
     _ymin = min - _BORDER * size
     _ymax = max + _BORDER * size
+    clearSpriteCache()
+    clearLayers()
 
 def setPenRadius(r=_DEFAULT_PEN_RADIUS):
     """
@@ -480,6 +521,29 @@ def filledPolygon(x, y):
     points.append((xScaled[0], yScaled[0]))
     pygame.draw.polygon(_surface, _pygameColor(_penColor), points, 0)
 
+@functools.lru_cache(maxsize=_FONT_CACHE_SIZE)
+def _font(family, size, bold):
+    """
+    Return the pygame font object of the given family, size and bold
+    flag. Creating a font needs a system font lookup and a font file
+    load, so the most recently used fonts are kept in a bounded LRU
+    cache keyed by (family, size, bold).
+    """
+    return pygame.font.SysFont(family, size, bold)
+
+def fontCacheInfo():
+    """
+    Return the statistics of the font cache as a named tuple with the
+    fields hits, misses, maxsize and currsize.
+    """
+    return _font.cache_info()
+
+def clearFontCache():
+    """
+    Remove all the fonts from the font cache and reset its statistics.
+    """
+    _font.cache_clear()
+
 def text(x, y, s):
     """
     Draw string s on the background canvas centered at (x, y).
@@ -489,10 +553,11 @@ def text(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize)
+    font = _font(_fontFamily, _fontSize, False)
     text = font.render(s, 1, _pygameColor(_penColor))
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
+    _markDirty(textpos)
 
 def boldText(x, y, s):
     """
@@ -503,10 +568,160 @@ def boldText(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize, True)
+    font = _font(_fontFamily, _fontSize, True)
     text = font.render(s, 1, _pygameColor(_penColor))
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
+    _markDirty(textpos)
+
+def labeledSquare(x, y, r, fillColor, borderColor, borderRadius,
+        textColor, s):
+    """
+    Draw on the background canvas a square whose sides are of length
+    2r, centered on (x, y), filled with fillColor, with a border of
+    color borderColor drawn with pen radius borderRadius, and with
+    string s drawn in textColor (using the current font) at its center.
+    The square is rendered once into a sprite that is cached by its
+    pixel size, colors, font and string, so drawing it again is a
+    single blit. The cache is emptied when the canvas size or the
+    scale changes.
+    """
+    _makeSureWindowCreated()
+    x = float(x)
+    y = float(y)
+    r = float(r)
+    # The square covers the same pixels as filledSquare(x, y, r).
+    left = int(_scaleX(x - r))
+    top = int(_scaleY(y - r) - _factorY(2.0 * r))
+    ws = int(_factorX(2.0 * r))
+    hs = int(_factorY(2.0 * r))
+    borderWidth = int(round(float(borderRadius) * float(_DEFAULT_CANVAS_SIZE)))
+    key = (ws, hs, str(fillColor), str(borderColor), borderWidth,
+        str(textColor), _fontFamily, _fontSize, s)
+    sprite = _spriteCache.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((max(ws, 1), max(hs, 1)))
+        sprite.fill(_pygameColor(fillColor))
+        pygame.draw.rect(sprite, _pygameColor(borderColor),
+            pygame.Rect(0, 0, ws, hs), borderWidth)
+        label = _font(_fontFamily, _fontSize, False).render(
+            s, 1, _pygameColor(textColor))
+        sprite.blit(label, label.get_rect(center=(ws / 2.0, hs / 2.0)))
+        _spriteCache[key] = sprite
+        if len(_spriteCache) > _SPRITE_CACHE_SIZE:
+            _spriteCache.popitem(last=False)
+    else:
+        _spriteCache.move_to_end(key)
+    _surface.blit(sprite, (left, top))
+    _markDirty(pygame.Rect(left, top, ws, hs))
+
+def clearSpriteCache():
+    """
+    Remove all the pre-rendered squares from the cache used by
+    labeledSquare.
+    """
+    _spriteCache.clear()
+
+def beginLayer(name):
+    """
+    Start drawing into a new offscreen layer with the given name, which
+    is as large as the canvas. All the drawing functions draw into the
+    layer until endLayer is called. The layer is kept (retained) so
+    that drawLayer can copy it to the background canvas in each frame
+    without drawing its contents again.
+    """
+    global _surface
+    global _layerTarget
+    _makeSureWindowCreated()
+    if _layerTarget is not None:
+        raise Exception('Another layer is being drawn')
+    layer = pygame.Surface((int(_canvasWidth), int(_canvasHeight)))
+    layer.fill(_pygameColor(WHITE))
+    _layers[name] = layer
+    _layerTarget = _surface
+    _surface = layer
+
+def endLayer():
+    """
+    Stop drawing into the layer started by beginLayer, so that drawing
+    goes to the background canvas again.
+    """
+    global _surface
+    global _layerTarget
+    if _layerTarget is None:
+        raise Exception('No layer is being drawn')
+    _surface = _layerTarget
+    _layerTarget = None
+
+def hasLayer(name):
+    """
+    Return True if a layer with the given name has been drawn (and not
+    cleared since). Otherwise return False.
+    """
+    return name in _layers
+
+def drawLayer(name, x=None, y=None, w=None, h=None):
+    """
+    Copy the layer with the given name to the background canvas. If
+    x, y, w and h are given, then copy only the part of the layer
+    covered by the rectangle of width w and height h whose lower left
+    point is (x, y), e.g. to restore the background behind a shape.
+    """
+    _makeSureWindowCreated()
+    if x is None:
+        _surface.blit(_layers[name], (0, 0))
+        _markDirty(_surface.get_rect())
+    else:
+        rect = _pixelRect(x, y, w, h)
+        _surface.blit(_layers[name], rect, rect)
+        _markDirty(rect)
+
+def setDirtyRectMode(enabled=True):
+    """
+    If enabled, then show copies to the window only the parts of the
+    background canvas marked as changed since the previous show: the
+    areas drawn by clear, text, boldText, labeledSquare, picture and
+    drawLayer and the rectangles given to markDirty (the other drawing
+    functions must be followed by markDirty). Otherwise (the default)
+    show copies the whole background canvas.
+    """
+    global _dirtyRects
+    _makeSureWindowCreated()
+    # The first frame in this mode copies the whole background canvas.
+    _dirtyRects = [_surface.get_rect()] if enabled else None
+
+def markDirty(x, y, w, h):
+    """
+    Mark the rectangle of width w and height h whose lower left point
+    is (x, y) as changed, so that the next show copies it to the window
+    in the dirty rectangle mode (see setDirtyRectMode).
+    """
+    _markDirty(_pixelRect(x, y, w, h))
+
+def _pixelRect(x, y, w, h):
+    """
+    Return the pixel rectangle of the rectangle of width w and height h
+    whose lower left point is (x, y), which covers the same pixels as
+    filledRectangle(x, y, w, h).
+    """
+    ws = _factorX(float(w))
+    hs = _factorY(float(h))
+    return pygame.Rect(_scaleX(float(x)), _scaleY(float(y)) - hs, ws, hs)
+
+def _markDirty(rect):
+    """
+    Record the pixel rectangle rect of the background canvas as changed
+    in the dirty rectangle mode; drawing into a layer is not recorded.
+    """
+    if _dirtyRects is not None and _layerTarget is None:
+        _dirtyRects.append(pygame.Rect(rect))
+
+def clearLayers():
+    """
+    Remove all the layers. Layers are also removed when the canvas size
+    or the scale changes, as their contents depend on them.
+    """
+    _layers.clear()
 
 def picture(pic, x=None, y=None):
     """
@@ -529,6 +744,7 @@ def picture(pic, x=None, y=None):
     hs = pic.height()
     picSurface = pic._surface # violates encapsulation
     _surface.blit(picSurface, [xs-ws/2.0, ys-hs/2.0, ws, hs])
+    _markDirty(pygame.Rect(xs-ws/2.0, ys-hs/2.0, ws, hs))
 
 def clear(c=WHITE):
     """
@@ -537,6 +753,7 @@ def clear(c=WHITE):
     """
     _makeSureWindowCreated()
     _surface.fill(_pygameColor(c))
+    _markDirty(_surface.get_rect())
 
 def save(f):
     """
@@ -562,8 +779,16 @@ def _show():
     """
     Copy the background canvas to the window canvas.
     """
-    _background.blit(_surface, (0, 0))
-    pygame.display.flip()
+    global _dirtyRects
+    if _dirtyRects is None:
+        _background.blit(_surface, (0, 0))
+        pygame.display.flip()
+    else:
+        # Copy and update only the changed parts of the canvas.
+        for rect in _dirtyRects:
+            _background.blit(_surface, rect, rect)
+        pygame.display.update(_dirtyRects)
+        _dirtyRects = []
     _checkForEvents()
 
 def _showAndWaitForever():
@@ -603,6 +828,18 @@ def show(msec=float('inf')):
         secondsWaited += QUANTUM
         _checkForEvents()
 
+def showFrame(fps=0):
+    """
+    Copy the background canvas to the window canvas without waiting
+    a fixed time. Then, if fps is positive, wait (using the pygame
+    clock) until 1/fps seconds have passed since the previous call,
+    so that at most fps frames are shown per second. Return the number
+    of milliseconds that have passed since the previous call.
+    """
+    _makeSureWindowCreated()
+    _show()
+    return _clock.tick(fps)
+
 #-----------------------------------------------------------------------
 
 def _saveToFile():
@@ -651,7 +888,6 @@ def _checkForEvents():
     pressed).  If a key has been typed, then put that key in a queue.
     """
     global _surface
-    global _keysTyped
     
     #-------------------------------------------------------------------
     # Begin added by Alan J. Broder
@@ -668,7 +904,12 @@ def _checkForEvents():
         if event.type == pygame.QUIT:
             sys.exit()
         elif event.type == pygame.KEYDOWN:
-            _keysTyped = [pygame.key.name(event.key)] + _keysTyped
+            _keyDown(pygame.key.name(event.key), pygame.time.get_ticks())
+        elif event.type == pygame.KEYUP:
+            _keyUp(pygame.key.name(event.key), pygame.time.get_ticks())
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            # the key-up events of the held keys are not received anymore
+            _heldKeys.clear()
         elif (event.type == pygame.MOUSEBUTTONUP) and \
             (event.button == 3):
             _saveToFile()
@@ -686,6 +927,9 @@ def _checkForEvents():
         # End added by Alan J. Broder
         #---------------------------------------------------------------
 
+    if _heldKeys:
+        _repeatHeldKeys(pygame.time.get_ticks())
+
 #-----------------------------------------------------------------------
 
 # Functions for retrieving keys
@@ -695,23 +939,85 @@ def hasNextKeyTyped():
     Return True if the queue of the keys the user typed is not empty.
     Otherwise return False.
     """
-    global _keysTyped
-    return _keysTyped != []
+    return len(_keysTyped) > 0
 
 def nextKeyTyped():
     """
     Remove the first key from the queue of the keys that the user typed,
     and return that key.
     """
-    global _keysTyped
-    return _keysTyped.pop()
+    return _keysTyped.popleft()
 
 def clearKeysTyped():
     """
-    Clear all the keys in the queue of the keys that the user typed.
+    Clear all the keys in the queue of the keys that the user typed
+    and all the events in the queue of the key events.
+    """
+    _keysTyped.clear()
+    _keyEvents.clear()
+
+# A key event: the time (in milliseconds since pygame was initialized) and
+# the name of the key, whether the key was pressed (True) or released
+# (False), and whether it is an automatic repeat of a held key
+KeyEvent = collections.namedtuple('KeyEvent', ['time', 'key', 'down', 'repeat'])
+
+def hasNextKeyEvent():
+    """
+    Return True if the queue of the key events is not empty. Otherwise
+    return False.
+    """
+    return len(_keyEvents) > 0
+
+def nextKeyEvent():
+    """
+    Remove the first event from the queue of the key events, and return
+    that event as a KeyEvent.
+    """
+    return _keyEvents.popleft()
+
+def setKeyRepeat(delay=0, interval=0, keys=()):
+    """
+    Make the given keys repeat while they are held: a held key is typed
+    again delay milliseconds after it was pressed (delayed auto shift)
+    and then once every interval milliseconds (auto repeat rate). The
+    repeats are added to the queue of the keys the user typed and to the
+    queue of the key events. By default (or if delay is 0) no key
+    repeats.
+    """
+    global _repeatDelay
+    global _repeatInterval
+    global _repeatKeys
+    _repeatDelay = delay
+    _repeatInterval = interval
+    _repeatKeys = frozenset(keys) if delay > 0 else frozenset()
+    _heldKeys.clear()
+
+def _keyDown(key, now):
+    """
+    Record that the key was pressed at the time now.
+    """
+    _keysTyped.append(key)
+    _keyEvents.append(KeyEvent(now, key, True, False))
+    if key in _repeatKeys:
+        _heldKeys[key] = now + _repeatDelay
+
+def _keyUp(key, now):
+    """
+    Record that the key was released at the time now.
+    """
+    _keyEvents.append(KeyEvent(now, key, False, False))
+    _heldKeys.pop(key, None)
+
+def _repeatHeldKeys(now):
+    """
+    Type again each held key whose next repeat is due at the time now.
     """
-    global _keysTyped
-    _keysTyped = []
+    for key, due in _heldKeys.items():
+        while due <= now:
+            _keysTyped.append(key)
+            _keyEvents.append(KeyEvent(due, key, True, True))
+            due += max(_repeatInterval, 1)
+        _heldKeys[key] = due
 
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
@@ -0,0 +1,149 @@
+################################################################################
+#                                                                              #
+# A seeded generator of the tetrominoes that enter the game grid               #
+#                                                                              #
+################################################################################
+
+from tetromino import Tetromino, SHAPES  # the tetrominoes and their shapes
+from collections import namedtuple  # used for the pieces
+import numpy as np  # the fundamental Python module for scientific computing
+import struct  # used for packing the snapshots of the generators
+
+# The types (shapes) of the tetrominoes that can enter the game grid
+TETROMINO_TYPES = ['I', 'I-90', 'I-270', 'I-180', 'O',
+                   'Z', 'Z-90', 'Z-180', 'Z-270',
+                   'T', 'T-90', 'T-180', 'T-270',
+                   'J', 'J-90', 'J-180', 'J-270',
+                   'L', 'L-90', 'L-180', 'L-270',
+                   'S', 'S-90', 'S-180', 'S-270']
+
+# The modes of the generator: "uniform" draws each type from TETROMINO_TYPES
+# with equal probability, "bag" deals the seven base shapes in a random order
+# (a 7-bag, so each base shape enters once every seven pieces) with a random
+# rotation for each of them
+MODES = ("uniform", "bag")
+
+# The base shapes of the 7-bag and, for each base shape, the indexes of its
+# rotations in TETROMINO_TYPES (the O shape has a single rotation)
+BASE_TYPES = ('I', 'O', 'Z', 'T', 'J', 'L', 'S')
+_ROTATIONS = [[i for i, t in enumerate(TETROMINO_TYPES) if t.split('-')[0] == base]
+              for base in BASE_TYPES]
+_N_ROTATIONS = np.array([len(rotations) for rotations in _ROTATIONS])
+_ROTATION_TABLE = np.array([(rotations * 4)[:4] for rotations in _ROTATIONS])
+# the size n of the tile matrix of each type
+_SIZE = np.array([SHAPES[t].n for t in TETROMINO_TYPES])
+
+# The fixed size part of a snapshot of a generator (see
+# PieceGenerator.snapshot): the grid width, the batch size, the mode, whether
+# there is a seed, the seed, the state of the PCG64 bit generator (its 128-bit
+# state and increment, the cached 32-bit flag and value) and the queue length
+_SNAPSHOT_HEADER = struct.Struct("<HHBBq16s16sBII")
+# The record of a drawn piece in a snapshot: the index of its type in
+# TETROMINO_TYPES, its column and the log2 exponents of its tile values
+_PIECE_RECORD = np.dtype([('type', 'u1'), ('x', 'u1'), ('tiles', 'u1', 4)])
+
+# A piece to enter the game grid: its type, the values of its four tiles (in
+# the order of the cells of its shape) and the column of its bottom left cell
+Piece = namedtuple('Piece', ['type', 'tiles', 'x'])
+
+# A class for generating the pieces of a game from a seeded random stream of
+# its own: the types (with their rotations), tile values and spawn columns
+# are drawn in bulk ahead of time, so any number of upcoming pieces can be
+# previewed and the same seed always gives the same sequence
+class PieceGenerator:
+   # A constructor for creating a generator of the pieces of a grid with the
+   # given width, where batch_size pieces are drawn at a time
+   def __init__(self, grid_w=12, seed=None, mode="uniform", batch_size=252):
+      if mode not in MODES:
+         raise ValueError(f"unknown piece generator mode: {mode}")
+      self.grid_width = grid_w
+      self.seed = seed
+      self.mode = mode
+      # whole bags are drawn at a time in the bag mode
+      self.batch_size = max(7, batch_size - batch_size % 7)
+      self.rng = np.random.default_rng(seed)
+      # the pieces drawn ahead of time (as _PIECE_RECORD records), of which
+      # the ones from position on are not taken yet (the preview queue)
+      self.drawn = np.zeros(0, dtype=_PIECE_RECORD)
+      self.position = 0
+
+   # A method that returns the state of the generator (its settings, the
+   # state of its random stream and the drawn pieces) as a flat byte buffer
+   def snapshot(self):
+      state = self.rng.bit_generator.state
+      records = self.drawn[self.position:]
+      header = _SNAPSHOT_HEADER.pack(
+         self.grid_width, self.batch_size, MODES.index(self.mode),
+         self.seed is not None, self.seed if self.seed is not None else 0,
+         state['state']['state'].to_bytes(16, 'little'),
+         state['state']['inc'].to_bytes(16, 'little'),
+         state['has_uint32'], state['uinteger'], len(records))
+      return header + records.tobytes()
+
+   # A method for restoring the state saved by snapshot from the given buffer
+   # starting at offset; returns the offset of the first byte after it
+   def restore(self, buffer, offset=0):
+      (self.grid_width, self.batch_size, mode, has_seed, seed, rng_state, rng_inc,
+       has_uint32, uinteger, n_queued) = _SNAPSHOT_HEADER.unpack_from(buffer, offset)
+      self.mode = MODES[mode]
+      self.seed = seed if has_seed else None
+      self.rng = np.random.default_rng()
+      self.rng.bit_generator.state = {
+         'bit_generator': 'PCG64',
+         'state': {'state': int.from_bytes(rng_state, 'little'),
+                   'inc': int.from_bytes(rng_inc, 'little')},
+         'has_uint32': has_uint32, 'uinteger': uinteger}
+      offset += _SNAPSHOT_HEADER.size
+      records = np.frombuffer(buffer, dtype=_PIECE_RECORD, count=n_queued, offset=offset)
+      self.drawn = records.copy()  # the buffer may be read-only
+      self.position = 0
+      return offset + records.nbytes
+
+   # A class method that creates a generator from a snapshot (see restore)
+   @classmethod
+   def from_snapshot(cls, buffer, offset=0):
+      generator = cls.__new__(cls)
+      generator.restore(buffer, offset)
+      return generator
+
+   # A method for drawing the next batch of pieces into the preview queue
+   def _refill(self):
+      k = self.batch_size
+      if self.mode == "bag":
+         # each row is a bag holding every base shape once in a random order
+         bags = self.rng.permuted(np.tile(np.arange(7), (k // 7, 1)), axis=1)
+         bases = bags.ravel()
+         rotations = self.rng.integers(0, 4, size=k) % _N_ROTATIONS[bases]
+         types = _ROTATION_TABLE[bases, rotations]
+      else:
+         types = self.rng.integers(0, len(TETROMINO_TYPES), size=k)
+      records = np.zeros(k, dtype=_PIECE_RECORD)
+      records['type'] = types
+      records['tiles'] = self.rng.integers(1, 3, size=(k, 4))  # 2 or 4 as exponents
+      records['x'] = self.rng.integers(0, self.grid_width - _SIZE[types] + 1)
+      self.drawn = np.concatenate((self.drawn[self.position:], records))
+      self.position = 0
+
+   # A method that returns the given record as a piece
+   def _piece(self, record):
+      piece_type, x, exponents = record.item()
+      return Piece(TETROMINO_TYPES[piece_type], tuple(1 << e for e in exponents.tolist()), x)
+
+   # A method that returns the next k pieces without taking them (the
+   # preview queue), drawing more pieces when needed
+   def peek(self, k=1):
+      while len(self.drawn) - self.position < k:
+         self._refill()
+      return [self._piece(record) for record in self.drawn[self.position:self.position + k]]
+
+   # A method for taking the next piece
+   def next_piece(self):
+      if self.position == len(self.drawn):
+         self._refill()
+      self.position += 1
+      return self._piece(self.drawn[self.position - 1])
+
+   # A method for taking the next piece as a tetromino placed above the grid
+   def next_tetromino(self):
+      piece = self.next_piece()
+      return Tetromino(piece.type, tile_values=piece.tiles, x=piece.x)
@@ -0,0 +1,220 @@
+################################################################################
+#                                                                              #
+# An enumerator of the placements (the reachable final resting positions) of  #
+# a tetromino on the game grid                                                 #
+#                                                                              #
+################################################################################
+
+from tetromino import Tetromino, SHAPES  # the tetrominoes and their shapes
+from collections import namedtuple, deque  # the placements and the path search
+
+# A placement: the type (rotation) of the tetromino and the position of its
+# bottom left cell where it comes to rest, i.e. where it is locked by the next
+# auto fall
+Placement = namedtuple('Placement', ['type', 'x', 'y'])
+
+# The columns of the tile matrices are shifted by this offset in the bit
+# masks of the positions, as the bottom left cell can be left of the grid
+_OFFSET = 3
+
+# A function that returns the rotations reachable from the given type (the
+# type itself first) by rotating it repeatedly
+def _rotations(shape_type):
+   rotations = [shape_type]
+   while SHAPES[rotations[-1]].next_type != shape_type:
+      rotations.append(SHAPES[rotations[-1]].next_type)
+   return rotations
+
+# A function that returns the occupied cells of the given type relative to
+# the bottom left corner of their bounding box
+def _normalized_cells(shape_type):
+   shape = SHAPES[shape_type]
+   return frozenset((col - shape.min_col, shape.max_row - row) for col, row in shape.cells)
+
+# The types that occupy the same cells as another rotation of their shape
+# (e.g. I and I-180), whose placements can be duplicates of each other
+_SYMMETRIC = frozenset(t for t in SHAPES for other in _rotations(t)
+                       if other != t and _normalized_cells(other) == _normalized_cells(t))
+
+# The occupied rows of each type for the collision checks: the offset of the
+# row below the top row of the tile matrix and the columns of its cells
+_ROWS = {t: tuple((i, tuple(col for col in range(shape.n) if mask >> col & 1))
+                  for i, mask in enumerate(shape.row_masks) if mask)
+         for t, shape in SHAPES.items()}
+
+# A function that returns a bit mask of the x positions (shifted by _OFFSET)
+# where the given shape fits with its bottom left cell at row y on a grid
+# with the given row masks, as Tetromino.fits
+def _free_positions(shape, y, row_masks, grid_h, grid_w):
+   if y + (shape.n - 1) - shape.max_row < 0:
+      return 0  # below the grid
+   # the positions that keep the shape inside the grid horizontally
+   free = ((1 << (grid_w - shape.max_col + shape.min_col)) - 1) << (_OFFSET - shape.min_col)
+   top = y + shape.n - 1  # the grid row of the top row of the matrix
+   for i, cols in _ROWS[shape.type]:
+      grid_row = top - i
+      if grid_row < grid_h and row_masks[grid_row]:
+         occupied = row_masks[grid_row] << _OFFSET
+         # the shape collides at x when the bit x + col of the row is set
+         for col in cols:
+            free &= ~(occupied >> col)
+   return free
+
+# A function that returns every distinct placement of the given tetromino on
+# the given game grid that is reachable from its current position with the
+# moves (left, right, down) and the rotations of the game. Placements that
+# would leave a tile above the grid are not included, and placements that
+# put the same tile values in the same cells (the symmetric rotations of the
+# O, I, S and Z shapes with matching values) are listed only once.
+#
+# The reachable positions are found row by row from the top: the positions
+# of each rotation in a row are a bit mask, which is closed under the
+# horizontal moves and the rotations with bitwise operations before moving
+# down to the next row.
+def find_placements(grid, tetromino):
+   tiles = [tetromino.tile_matrix[row][col].number for col, row in tetromino.shape.cells]
+   return enumerate_placements(grid, tetromino.type, tetromino.bottom_left_cell.x,
+                               tetromino.bottom_left_cell.y, tiles)
+
+# A function that returns the placements of a tetromino given by its type,
+# the position (x, y) of its bottom left cell and its tile values (or any
+# other labels of its tiles, e.g. log2 exponents, in the order of the cells of
+# its shape) as find_placements, without creating the tetromino
+def enumerate_placements(grid, shape_type, x0, y0, tiles):
+   grid_h, grid_w = grid.grid_height, grid.grid_width
+   row_masks = grid.row_masks
+   rotations = _rotations(shape_type)
+   shapes = [SHAPES[shape_type] for shape_type in rotations]
+   n_rot = len(rotations)
+   # the lowest row of the bottom left cell over all the rotations
+   y_min = min(shape.max_row - (shape.n - 1) for shape in shapes)
+   # above the row y_clear no rotation can touch the tiles on the grid even
+   # after moving down by one, so every position inside the grid is free
+   stack_height = int(max(grid.column_heights, default=0))
+   y_clear = stack_height + max(shape.max_row - (shape.n - 1) for shape in shapes) + 1
+   free_rows = {}
+   def free(y):
+      if y not in free_rows:
+         free_rows[y] = [_free_positions(shape, y, row_masks, grid_h, grid_w)
+                         for shape in shapes]
+      return free_rows[y]
+   # the tetromino can move away from its current position even when it
+   # overlaps the tiles there (e.g. it entered the grid on top of them)
+   start = 1 << (x0 + _OFFSET)
+   free(y0)[0] |= start
+   reach = [start] + [0] * (n_rot - 1)  # the reached positions in the row
+   symmetric = any(shape_type in _SYMMETRIC for shape_type in rotations)
+   placements, seen = [], set()
+   y = y0
+   while y >= y_min:
+      free_y, free_below = free(y), free(y - 1)
+      # close the reached positions of the row under the horizontal moves and
+      # the rotations (which also need the top of the shape inside the grid)
+      changed = True
+      while changed:
+         changed = False
+         for r in range(n_rot):
+            reached, mask = reach[r], free_y[r]
+            while True:
+               grown = (reached | (reached << 1) | (reached >> 1)) & mask
+               if grown == reached:
+                  break
+               reached = grown
+            reach[r] = reached
+            rotated = (r + 1) % n_rot
+            if rotated == r or y + (shapes[rotated].n - 1) - shapes[rotated].min_row >= grid_h:
+               continue
+            new = reached & free_y[rotated] & ~reach[rotated]
+            if new:
+               reach[rotated] |= new
+               changed = True
+      # the positions that cannot move down are the resting positions
+      for r, shape in enumerate(shapes):
+         resting = reach[r] & ~free_below[r]
+         if not resting or y + (shape.n - 1) - shape.min_row >= grid_h:
+            continue
+         while resting:
+            bit = resting & -resting
+            resting ^= bit
+            x = bit.bit_length() - 1 - _OFFSET
+            if symmetric:
+               key = frozenset((x + col, y + (shape.n - 1) - row, tile)
+                               for (col, row), tile in zip(shape.cells, tiles))
+               if key in seen:
+                  continue
+               seen.add(key)
+            placements.append(Placement(rotations[r], x, y))
+      # the positions reached in the next row by moving down
+      reach = [reach[r] & free_below[r] for r in range(n_rot)]
+      if not any(reach):
+         break
+      y -= 1
+      # when every position inside the grid is reached in every rotation
+      # above y_clear, the rows down to y_clear add nothing new
+      if y > y_clear and reach == free(y):
+         y = y_clear
+         reach = list(free(y))
+   return placements
+
+# A function that returns the path that rotates the tetromino in place, then
+# moves it sideways and then down to the placement, or None if one of these
+# positions is blocked; no path can be shorter, so find_path tries it first
+def _direct_path(grid, tetromino, placement):
+   rotations = _rotations(tetromino.type)
+   if placement.type not in rotations:
+      return None
+   x, y = tetromino.bottom_left_cell.x, tetromino.bottom_left_cell.y
+   if placement.y > y:
+      return None
+   n_turns = rotations.index(placement.type)
+   step = 1 if placement.x > x else -1
+   moves = ["up"] * n_turns
+   positions = [(shape_type, x, y) for shape_type in rotations[1:n_turns + 1]]
+   moves += ["right" if step == 1 else "left"] * abs(placement.x - x)
+   positions += [(placement.type, new_x, y) for new_x in range(x + step, placement.x + step, step)]
+   moves += ["down"] * (y - placement.y)
+   positions += [(placement.type, placement.x, new_y) for new_y in range(y - 1, placement.y - 1, -1)]
+   for i, (shape_type, new_x, new_y) in enumerate(positions):
+      shape = SHAPES[shape_type]
+      # a rotation also needs the top of the rotated shape inside the grid
+      if i < n_turns and new_y + (shape.n - 1) - shape.min_row >= Tetromino.grid_height:
+         return None
+      if not tetromino.fits(shape, new_x, new_y, grid):
+         return None
+   return moves
+
+# A function that returns the shortest sequence of actions (see
+# game_engine.ACTIONS) that moves the given tetromino from its current
+# position to the given placement on the grid, or None if it is unreachable;
+# the tetromino is locked there by the next auto fall
+def find_path(grid, tetromino, placement):
+   path = _direct_path(grid, tetromino, placement)
+   if path is not None:
+      return path
+   start = (tetromino.type, tetromino.bottom_left_cell.x, tetromino.bottom_left_cell.y)
+   parents = {start: None}
+   queue = deque([start])
+   while queue:
+      state = queue.popleft()
+      shape_type, x, y = state
+      if state == tuple(placement):
+         path = []
+         while parents[state] is not None:
+            state, action = parents[state]
+            path.append(action)
+         return path[::-1]
+      shape = SHAPES[shape_type]
+      next_shape = SHAPES[shape.next_type]
+      moves = (("left", (shape_type, x - 1, y)), ("right", (shape_type, x + 1, y)),
+               ("down", (shape_type, x, y - 1)), ("up", (next_shape.type, x, y)))
+      for action, (new_type, new_x, new_y) in moves:
+         new_state = (new_type, new_x, new_y)
+         if new_state in parents:
+            continue
+         new_shape = SHAPES[new_type]
+         if action == "up" and new_y + (new_shape.n - 1) - new_shape.min_row >= Tetromino.grid_height:
+            continue
+         if tetromino.fits(new_shape, new_x, new_y, grid):
+            parents[new_state] = (state, action)
+            queue.append(new_state)
+   return None
@@ -0,0 +1,192 @@
+################################################################################
+#                                                                              #
+# A compact binary replay format for recording and re-simulating games of      #
+# Tetris 2048                                                                  #
+#                                                                              #
+################################################################################
+
+from game_engine import TetrisGame, ACTIONS  # the headless game engine
+from piece_generator import MODES  # the modes of the piece generator
+from collections import namedtuple  # used for the replay headers
+import struct  # used for packing the headers and the footers
+import random  # used for the random number generators of the policies
+
+# A replay file holds one or more games written one after another. Each game
+# is a header, one byte per event in the order the events happened (TICK for
+# the auto fall of the active tetromino and 1 + ACTIONS.index(action) for an
+# action) and a footer: the END byte followed by the final score. Since the
+# games are deterministic for a given seed, these are enough to re-simulate
+# them exactly. A game without a footer (e.g. the program was closed) can
+# still be replayed up to its last event.
+MAGIC = b"T2KR"
+VERSION = 1
+TICK = 0
+END = 0xFF
+# magic, version, grid height, grid width, piece generator mode, seed
+_HEADER = struct.Struct("<4sBHHBq")
+_SCORE = struct.Struct("<q")
+_ACTION_CODES = {action: bytes((i + 1,)) for i, action in enumerate(ACTIONS)}
+_TICK_CODE = bytes((TICK,))
+
+# The settings of a recorded game needed for re-simulating it
+ReplayHeader = namedtuple('ReplayHeader', ['grid_h', 'grid_w', 'piece_mode', 'seed'])
+
+# A class for appending the events of games to a replay file as they happen
+class ReplayWriter:
+   # A constructor for opening the replay file at path for appending
+   def __init__(self, path):
+      self.file = open(path, "ab")
+      self.recording = False  # True between begin_game and end_game
+
+   # A method for starting the record of the given game (before any event);
+   # the game must have an integer seed to be reproducible
+   def begin_game(self, game):
+      if not isinstance(game.seed, int):
+         raise ValueError("only the games with an integer seed can be recorded")
+      self.file.write(_HEADER.pack(MAGIC, VERSION, game.grid.grid_height,
+                                   game.grid.grid_width, MODES.index(game.pieces.mode),
+                                   game.seed))
+      self.recording = True
+
+   # A method for recording an action applied with TetrisGame.act (the
+   # actions that TetrisGame ignores are not recorded)
+   def record_action(self, action):
+      code = _ACTION_CODES.get(action)
+      if code is not None:
+         self.file.write(code)
+
+   # A method for recording a call of TetrisGame.tick
+   def record_tick(self):
+      self.file.write(_TICK_CODE)
+
+   # A method for recording a call of TetrisGame.step
+   def record_step(self, action=None):
+      self.record_action(action)
+      self.file.write(_TICK_CODE)
+
+   # A method for ending the record of the current game with its final score
+   def end_game(self, score):
+      self.file.write(bytes((END,)) + _SCORE.pack(score))
+      self.file.flush()
+      self.recording = False
+
+   # A method for closing the replay file
+   def close(self):
+      self.file.close()
+
+# A class for reading the games of a replay file as a stream of fixed size
+# blocks, so that replays of very long sessions are never loaded entirely
+class ReplayReader:
+   # A constructor for opening the replay file at path for reading
+   def __init__(self, path, block_size=1 << 16):
+      self.file = open(path, "rb")
+      self.block_size = block_size
+      self.buffer = b""
+      self.final_score = None  # the recorded score of the last game read
+
+   # A method that returns the next n bytes of the file (fewer at its end)
+   def _read(self, n):
+      while len(self.buffer) < n:
+         block = self.file.read(self.block_size)
+         if not block:
+            break
+         self.buffer += block
+      data, self.buffer = self.buffer[:n], self.buffer[n:]
+      return data
+
+   # A method that reads and returns the header of the next game, or None at
+   # the end of the file
+   def read_header(self):
+      data = self._read(_HEADER.size)
+      if not data:
+         return None
+      if len(data) < _HEADER.size:
+         raise ValueError("truncated replay header")
+      magic, version, grid_h, grid_w, mode, seed = _HEADER.unpack(data)
+      if magic != MAGIC or version != VERSION:
+         raise ValueError("not a replay file of a supported version")
+      return ReplayHeader(grid_h, grid_w, MODES[mode], seed)
+
+   # A generator method that yields the events of the current game (after
+   # read_header) as blocks of bytes, one byte per event, and then reads its
+   # final score into final_score (None if the game has no footer)
+   def iter_events(self):
+      self.final_score = None
+      while True:
+         if not self.buffer:
+            self.buffer = self.file.read(self.block_size)
+            if not self.buffer:
+               return
+         end = self.buffer.find(END)
+         if end < 0:
+            events, self.buffer = self.buffer, b""
+            yield events
+            continue
+         events, self.buffer = self.buffer[:end], self.buffer[end + 1:]
+         if events:
+            yield events
+         data = self._read(_SCORE.size)
+         if len(data) == _SCORE.size:
+            self.final_score = _SCORE.unpack(data)[0]
+         return
+
+   # A method for closing the replay file
+   def close(self):
+      self.file.close()
+
+# A function for creating a new game with the settings in the given header
+def create_game(header, packed=True):
+   return TetrisGame(header.grid_h, header.grid_w, header.seed, packed,
+                     header.piece_mode)
+
+# A function for applying the events in the given block of bytes to a game
+# (as fast as possible)
+def apply_events(game, events):
+   act, tick = game.act, game.tick
+   for code in events:
+      if code == TICK:
+         tick()
+      else:
+         act(ACTIONS[code - 1])
+
+# A generator function that re-simulates the games of a replay file
+# headlessly at maximum speed and yields for each game the game in its final
+# state and its recorded final score (None if the game has no footer)
+def iter_replayed_games(path, packed=True):
+   reader = ReplayReader(path)
+   try:
+      while True:
+         header = reader.read_header()
+         if header is None:
+            return
+         game = create_game(header, packed)
+         for events in reader.iter_events():
+            apply_events(game, events)
+         yield game, reader.final_score
+   finally:
+      reader.close()
+
+# A function that re-simulates the games of a replay file and returns for
+# each game whether its final score matches the recorded one
+def verify_replays(path):
+   return [game.grid.score == final_score
+           for game, final_score in iter_replayed_games(path)]
+
+# A function for recording the games with the given seeds played headlessly
+# with the given policy (see tournament) to a replay file
+def record_games(path, seeds, policy, grid_h=20, grid_w=12, max_steps=100000,
+                 piece_mode="uniform"):
+   writer = ReplayWriter(path)
+   try:
+      for seed in seeds:
+         game = TetrisGame(grid_h, grid_w, seed, True, piece_mode)
+         policy_rng = random.Random(f"policy-{seed}")
+         writer.begin_game(game)
+         for _ in range(max_steps):
+            action = policy(game, policy_rng)
+            writer.record_step(action)
+            if game.step(action):
+               break
+         writer.end_game(game.grid.score)
+   finally:
+      writer.close()
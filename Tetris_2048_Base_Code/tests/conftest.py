@@ -0,0 +1,5 @@
+# the modules of the game are imported by their names from the code directory
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,64 @@
+################################################################################
+#                                                                              #
+# Tests of the expectimax AI player: its search spread over the frames of the #
+# game loop and its transposition table                                        #
+#                                                                              #
+################################################################################
+
+from agent import ExpectimaxAgent  # the AI player under test
+from game_engine import TetrisGame, GRAVITY  # the headless game engine
+from Tetris_2048 import AI_TIME_BUDGET, FRAME_RATE  # the shipped settings
+
+# A function that plays the given number of pieces of a game with the agent
+# like the game loop does, searching each move for at most the given number
+# of frames; returns the completed depth of the search of each move
+def play(agent, game, n_pieces, frames):
+   depths = []
+   while not game.game_over and game.pieces_placed < n_pieces:
+      for _ in range(frames):
+         if agent.search(game):
+            break
+      depths.append(agent.depth)
+      for action in agent.plan(game):
+         game.act(action)
+      game.tick()
+   return depths
+
+# the shipped time budget, spread over the frames between the logic ticks of
+# the first level, searches every move beyond the first placement and the
+# search finds the values of its subtrees in the transposition table
+def test_shipped_budget_reaches_depth_2():
+   agent = ExpectimaxAgent(time_budget=AI_TIME_BUDGET)
+   game = TetrisGame(20, 12, 0, packed=True)
+   frames = int(FRAME_RATE / GRAVITY[0])
+   hits = 0
+   for _ in range(20):
+      depths = play(agent, game, game.pieces_placed + 1, frames)
+      hits += agent.table_hits
+      assert depths[0] >= 2
+   assert hits > 0
+
+# a search resumed over many calls chooses the same placements as searches
+# that are not interrupted
+def test_resumed_search_matches_uninterrupted_search():
+   for seed in range(3):
+      resumed = ExpectimaxAgent(max_depth=2, time_budget=AI_TIME_BUDGET / 8)
+      uninterrupted = ExpectimaxAgent(max_depth=2)
+      game = TetrisGame(20, 12, seed, packed=True)
+      for _ in range(10):
+         while not resumed.search(game):
+            pass
+         assert resumed.best == uninterrupted.choose_placement(game)
+         for action in uninterrupted.plan(game):
+            game.act(action)
+         game.tick()
+
+# the table is keyed by the board, and an entry is used by any search of at
+# most the depth it was searched to
+def test_table_entries_serve_shallower_searches():
+   agent = ExpectimaxAgent()
+   agent._store(0x2048, 2, 1.5)
+   assert agent._lookup(0x2048, 1) == 1.5
+   assert agent._lookup(0x2048, 2) == 1.5
+   assert agent._lookup(0x2048, 3) is None
+   assert agent.table_hits == 2
@@ -0,0 +1,194 @@
+################################################################################
+#                                                                              #
+# Differential tests of the merges and the row clears of GameGrid against the  #
+# per-cell loops of the original code, on object and packed boards             #
+#                                                                              #
+################################################################################
+
+from game_grid import GameGrid, value_to_exponent  # the grid under test
+from tile import Tile  # the tiles of the object boards
+from point import Point  # the positions of the locked tiles
+import numpy as np  # the fundamental Python module for scientific computing
+import random  # used for the random boards and locks
+import pytest  # the test runner
+
+# A class for the reference grid: the lock, merge and row clear loops of the
+# original GameGrid (without the drawing), copied unchanged
+class ReferenceGrid:
+   def __init__(self, grid_h, grid_w):
+      self.grid_height = grid_h
+      self.grid_width = grid_w
+      self.tile_matrix = np.full((grid_h, grid_w), None)
+      self.current_tetromino = None
+      self.game_over = False
+      self.score = 0
+
+   def is_inside(self, row, col):
+      return 0 <= row < self.grid_height and 0 <= col < self.grid_width
+
+   def update_grid(self, tiles_to_lock, blc_position):
+      self.current_tetromino = None
+      # Lock new tiles onto the grid
+      n_rows, n_cols = len(tiles_to_lock), len(tiles_to_lock[0])
+      for col in range(n_cols):
+         for row in range(n_rows):
+            if tiles_to_lock[row][col] is not None:
+               pos = Point()
+               pos.x = blc_position.x + col
+               pos.y = blc_position.y + (n_rows - 1) - row
+               if self.is_inside(pos.y, pos.x):
+                  self.tile_matrix[pos.y][pos.x] = tiles_to_lock[row][col]
+               else:
+                  self.game_over = True
+      # Perform merges before clearing rows
+      self._merge_tiles()
+      # Clear any full rows
+      self._clear_full_rows()
+
+      return self.game_over
+
+   def _merge_tiles(self):
+      # Merge vertically in each column, bottom-to-top, allowing chains
+      for col in range(self.grid_width):
+         row = 0
+         while row < self.grid_height - 1:
+            bottom = self.tile_matrix[row][col]
+            top = self.tile_matrix[row+1][col]
+            if bottom and top and bottom.number == top.number:
+               # Merge into bottom
+               merged_value = bottom.number * 2
+               bottom.number = merged_value
+               bottom.update_colors()
+               self.score += merged_value
+               # Shift everything above down
+               for r in range(row+1, self.grid_height-1):
+                  self.tile_matrix[r][col] = self.tile_matrix[r+1][col]
+               self.tile_matrix[self.grid_height-1][col] = None
+               # Stay on this row for chain merges
+            else:
+               row += 1
+
+   def _clear_full_rows(self):
+      row = 0
+      while row < self.grid_height:
+         if all(self.tile_matrix[row, c] is not None for c in range(self.grid_width)):
+            row_sum = sum(
+               self.tile_matrix[row][c].number for c in range(self.grid_width) if self.tile_matrix[row][c] is not None
+            )
+            self.score += row_sum
+            # clear the row
+            self.tile_matrix[row, :] = [None] * self.grid_width
+            # move the rows above it down
+            for r in range(row, self.grid_height - 1):
+               self.tile_matrix[r, :] = self.tile_matrix[r + 1, :]
+            self.tile_matrix[self.grid_height - 1, :] = [None] * self.grid_width
+            # check the same row again
+         else:
+            row += 1
+
+# A function that returns the grids compared by the tests: the reference
+# grid, an object GameGrid and a packed GameGrid, all holding the given
+# board of tile values (0 = empty, row 0 at the bottom)
+def create_grids(board):
+   grid_h, grid_w = len(board), len(board[0])
+   grids = [ReferenceGrid(grid_h, grid_w), GameGrid(grid_h, grid_w),
+            GameGrid(grid_h, grid_w, packed=True)]
+   for row in range(grid_h):
+      for col in range(grid_w):
+         if board[row][col]:
+            grids[0].tile_matrix[row, col] = Tile(board[row][col])
+            grids[1].tile_matrix[row, col] = Tile(board[row][col])
+            grids[2].exponent_matrix[row, col] = value_to_exponent(board[row][col])
+   # the boards were modified directly
+   grids[1].invalidate()
+   grids[2].invalidate()
+   return grids
+
+# A function that returns the board of the given grid as log2 exponents
+def exponents(grid):
+   if isinstance(grid, GameGrid):
+      return grid.get_exponent_matrix()
+   return np.array([[0 if tile is None else value_to_exponent(tile.number) for tile in row]
+                    for row in grid.tile_matrix])
+
+# A function for locking the given matrix of tile values (None = no tile) at
+# the given bottom left position onto each of the grids (each gets its own
+# Tile objects) and checking that they all end up with the same board, score
+# and game over flag
+def lock_and_compare(grids, values, x, y):
+   for grid in grids:
+      tiles = np.full((len(values), len(values[0])), None)
+      for row, row_values in enumerate(values):
+         for col, value in enumerate(row_values):
+            if value is not None:
+               tiles[row, col] = Tile(value)
+      grid.update_grid(tiles, Point(x, y))
+   reference = exponents(grids[0])
+   for grid in grids[1:]:
+      assert grid.score == grids[0].score
+      assert grid.game_over == grids[0].game_over
+      np.testing.assert_array_equal(exponents(grid), reference)
+      # the incremental bookkeeping matches the board
+      occupancy = reference != 0
+      assert grid.row_counts.tolist() == occupancy.sum(axis=1).tolist()
+      assert grid.row_masks == [sum(1 << int(col) for col in np.flatnonzero(row))
+                                for row in occupancy]
+      grid.check_hash()
+
+# A function that returns a random board with the given dimensions
+def random_board(rng, grid_h, grid_w):
+   density = rng.random()
+   return [[rng.choice((2, 4, 8, 16)) if rng.random() < density else 0
+            for _ in range(grid_w)] for _ in range(grid_h)]
+
+# A function for locking random blocks of 2 and 4 tiles at random positions
+# (some of them partly above the grid) onto the grids
+def lock_random_blocks(rng, grids, n_locks):
+   grid_h, grid_w = grids[0].grid_height, grids[0].grid_width
+   for _ in range(n_locks):
+      n = rng.randint(1, min(3, grid_w))
+      values = [[rng.choice((None, 2, 4)) for _ in range(n)] for _ in range(n)]
+      values[0][0] = values[0][0] or 2
+      lock_and_compare(grids, values, rng.randint(0, grid_w - n), rng.randint(-1, grid_h - 1))
+
+@pytest.mark.parametrize("seed", range(8))
+def test_random_boards(seed):
+   rng = random.Random(seed)
+   for _ in range(100):
+      grids = create_grids(random_board(rng, rng.randint(2, 9), rng.randint(1, 7)))
+      lock_random_blocks(rng, grids, 6)
+
+@pytest.mark.parametrize("seed", range(4))
+def test_tall_grids(seed):
+   rng = random.Random(seed)
+   for _ in range(15):
+      grids = create_grids(random_board(rng, rng.randint(20, 60), rng.randint(4, 12)))
+      lock_random_blocks(rng, grids, 10)
+
+# the tiles on the chains of halving values merge one after the other, over
+# several updates where a doubled tile meets an equal tile below it
+@pytest.mark.parametrize("grid_h", [8, 24, 64])
+def test_chained_merges(grid_h):
+   grid_w = 4
+   board = [[0] * grid_w for _ in range(grid_h)]
+   for col in range(grid_w):
+      # halving values from the bottom of each column (2 at the top)
+      for row in range(min(grid_h - 2, 12 - col)):
+         board[row][col] = 1 << (min(grid_h - 2, 12 - col) - row)
+   grids = create_grids(board)
+   for step in range(2 * grid_h):
+      col = step % grid_w
+      top = int(np.count_nonzero(exponents(grids[0])[:, col]))
+      lock_and_compare(grids, [[2]], col, min(top, grid_h - 1))
+
+# the merges fill rows that are then cleared, and the rows on both sides of a
+# cleared band can hold equal tiles that merge on the next update
+def test_merges_and_clears():
+   rng = random.Random(2048)
+   for _ in range(200):
+      grid_h, grid_w = rng.randint(3, 10), rng.randint(2, 6)
+      board = [[rng.choice((2, 4)) for _ in range(grid_w)] for _ in range(grid_h - 2)]
+      for row in rng.sample(range(grid_h - 2), k=min(2, grid_h - 2)):
+         board[row][rng.randrange(grid_w)] = 0
+      grids = create_grids(board + [[0] * grid_w, [0] * grid_w])
+      lock_random_blocks(rng, grids, 8)
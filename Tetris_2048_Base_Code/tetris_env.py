@@ -0,0 +1,176 @@
+################################################################################
+#                                                                              #
+# Reinforcement learning environments of Tetris 2048 with the interface of    #
+# Gymnasium (reset and step) and preallocated observation buffers             #
+#                                                                              #
+################################################################################
+
+from game_engine import TetrisGame, ACTIONS  # the headless game engine
+from piece_generator import TETROMINO_TYPES  # the types of the tetrominoes
+from game_grid import value_to_exponent  # the tile values as log2 exponents
+import numpy as np  # the fundamental Python module for scientific computing
+
+# The actions of the environments, chosen by their indexes: no action (only
+# the auto fall) or one of the actions of the game engine
+ENV_ACTIONS = (None,) + ACTIONS
+
+# A function that returns the shapes and the types of the arrays of an
+# observation of a game on a grid with the given dimensions:
+#   board    two exponent planes (0 = empty): the tiles locked onto the grid
+#            and the tiles of the active tetromino in their current cells
+#   current  the active tetromino: the index of its type in TETROMINO_TYPES,
+#            the position (x, y) of its bottom left cell and the exponents of
+#            its four tiles in the order of the cells of its shape
+#   next     the next tetromino, encoded in the same way as current
+#   score    the score of the game
+def observation_spec(grid_h, grid_w):
+   return {"board": ((2, grid_h, grid_w), np.uint8),
+           "current": ((7,), np.int16),
+           "next": ((7,), np.int16),
+           "score": ((1,), np.int64)}
+
+# A function for allocating the arrays of the observations of batch_size
+# games (of a single game when batch_size is None)
+def allocate_observations(grid_h, grid_w, batch_size=None):
+   batch = () if batch_size is None else (batch_size,)
+   return {name: np.zeros(batch + shape, dtype=dtype)
+           for name, (shape, dtype) in observation_spec(grid_h, grid_w).items()}
+
+# A function for writing the encoding of the given tetromino (see
+# observation_spec) into the given array in place
+def _encode_tetromino(tetromino, out):
+   out[0] = TETROMINO_TYPES.index(tetromino.type)
+   out[1] = tetromino.bottom_left_cell.x
+   out[2] = tetromino.bottom_left_cell.y
+   for i, (col, row) in enumerate(tetromino.shape.cells):
+      out[3 + i] = value_to_exponent(tetromino.tile_matrix[row][col].number)
+
+# A class for a single game of Tetris 2048 as an environment: each step
+# applies an action (an index into ENV_ACTIONS or the action itself) followed
+# by the auto fall (TetrisGame.step), and the reward is the score gained by
+# the step. The observation is a dict of arrays (see observation_spec) that is
+# allocated once and written in place by reset and step, so it must be copied
+# to be kept across steps. The game runs on a packed grid and stddraw is
+# never imported.
+class Env:
+   # the actions indexed by the action numbers
+   actions = ENV_ACTIONS
+
+   # A constructor for creating an environment of games on a grid with the
+   # given dimensions, truncated after max_steps steps (None for no limit);
+   # observations are written into the given arrays (e.g. views of the
+   # buffers of a VectorEnv) or into arrays allocated here
+   def __init__(self, grid_h=20, grid_w=12, piece_mode="uniform", max_steps=None,
+                observation=None):
+      self.grid_height = grid_h
+      self.grid_width = grid_w
+      self.piece_mode = piece_mode
+      self.max_steps = max_steps
+      if observation is None:
+         observation = allocate_observations(grid_h, grid_w)
+      self.observation = observation
+      self.game = None
+      self.steps = 0
+
+   # A method for writing the observation of the current state of the game
+   # into the observation arrays
+   def _observe(self):
+      game, observation = self.game, self.observation
+      board = observation["board"]
+      board[0] = game.grid.exponent_matrix
+      board[1] = 0
+      tetromino = game.current_tetromino
+      _encode_tetromino(tetromino, observation["current"])
+      top = tetromino.bottom_left_cell.y + tetromino.shape.n - 1
+      for (col, row), exponent in zip(tetromino.shape.cells, observation["current"][3:]):
+         y = top - row
+         if 0 <= y < self.grid_height:
+            board[1, y, tetromino.bottom_left_cell.x + col] = exponent
+      _encode_tetromino(game.next_tetromino, observation["next"])
+      observation["score"][0] = game.grid.score
+
+   # A method that returns the information about the game returned by reset
+   # and step
+   def _info(self):
+      return {"pieces_placed": self.game.pieces_placed,
+              "lines_cleared": self.game.grid.lines_cleared,
+              "level": self.game.level()}
+
+   # A method for starting a new game whose pieces are drawn with the given
+   # seed; returns the observation and the information about the game
+   def reset(self, seed=None):
+      self.game = TetrisGame(self.grid_height, self.grid_width, seed, True, self.piece_mode)
+      self.steps = 0
+      self._observe()
+      return self.observation, self._info()
+
+   # A method for applying the given action to the game; returns the
+   # observation, the reward, whether the game is over (terminated), whether
+   # it reached max_steps (truncated) and the information about the game
+   def step(self, action):
+      if action is not None and not isinstance(action, str):
+         action = ENV_ACTIONS[action]
+      score = self.game.grid.score
+      terminated = self.game.step(action)
+      self.steps += 1
+      truncated = not terminated and self.max_steps is not None and self.steps >= self.max_steps
+      self._observe()
+      return (self.observation, self.game.grid.score - score, terminated, truncated,
+              self._info())
+
+# A class for stepping num_envs environments together, whose observations are
+# written in place into one set of arrays with the environments as the first
+# axis (the observation of environment i is a view of row i of these arrays),
+# so a batch of observations never has to be stacked. An environment whose
+# game ends in a step is reset in the same step (with the next seed of its
+# own seed sequence), and its final score is given in the information.
+class VectorEnv:
+   # A constructor for creating num_envs environments with the given settings
+   # (see Env)
+   def __init__(self, num_envs, grid_h=20, grid_w=12, piece_mode="uniform", max_steps=None):
+      self.num_envs = num_envs
+      self.observation = allocate_observations(grid_h, grid_w, num_envs)
+      self.envs = [Env(grid_h, grid_w, piece_mode, max_steps,
+                       {name: array[i] for name, array in self.observation.items()})
+                   for i in range(num_envs)]
+      # the preallocated rewards, termination flags and final scores
+      self.rewards = np.zeros(num_envs, dtype=np.int64)
+      self.terminated = np.zeros(num_envs, dtype=bool)
+      self.truncated = np.zeros(num_envs, dtype=bool)
+      self.final_scores = np.zeros(num_envs, dtype=np.int64)
+      # the seed of the next game of each environment (None for random seeds)
+      self.seeds = [None] * num_envs
+
+   # A method for starting new games in all the environments, where the
+   # environment i draws its pieces with seed + i (and its later games with
+   # seed + i + num_envs, seed + i + 2 * num_envs, ...); returns the
+   # observations and the information about the games
+   def reset(self, seed=None):
+      for i, env in enumerate(self.envs):
+         self.seeds[i] = None if seed is None else seed + i
+         self._reset_env(i)
+      return self.observation, {}
+
+   # A method for starting the next game of the environment i
+   def _reset_env(self, i):
+      seed = self.seeds[i]
+      self.envs[i].reset(seed)
+      if seed is not None:
+         self.seeds[i] = seed + self.num_envs
+
+   # A method for applying the given actions (one for each environment, see
+   # Env.step); returns the observations, the rewards, the termination and
+   # truncation flags and the information holding the final scores of the
+   # games that ended in this step (0 for the others)
+   def step(self, actions):
+      self.final_scores[:] = 0
+      for i, (env, action) in enumerate(zip(self.envs, actions)):
+         _, reward, terminated, truncated, _ = env.step(action)
+         self.rewards[i] = reward
+         self.terminated[i] = terminated
+         self.truncated[i] = truncated
+         if terminated or truncated:
+            self.final_scores[i] = env.game.grid.score
+            self._reset_env(i)
+      return (self.observation, self.rewards, self.terminated, self.truncated,
+              {"final_scores": self.final_scores})
@@ -1,224 +1,116 @@
 from tile import Tile  # used for modeling each tile on the tetrominoes
 from point import Point  # used for tile positions
-import copy as cp  # the copy module is used for copying tiles and positions
 import random  # the random module is used for generating random values
 import numpy as np  # the fundamental Python module for scientific computing
-
-# A class for modeling tetrominoes with 3 out of 7 different types as I, O and Z
+from collections import namedtuple  # used for the precomputed shape table
+import struct  # used for packing the snapshots of the tetrominoes
+
+# The occupied cells of each tetromino type (shape and rotation state) as
+# (column_index, row_index) pairs in its n x n tile matrix (row 0 is the top)
+# together with n (see the documentation given with this code)
+SHAPE_CELLS = {
+   'I': (4, ((1, 0), (1, 1), (1, 2), (1, 3))),
+   'I-90': (4, ((0, 1), (1, 1), (2, 1), (3, 1))),
+   'I-180': (4, ((1, 0), (1, 1), (1, 2), (1, 3))),
+   'I-270': (4, ((0, 2), (1, 2), (2, 2), (3, 2))),
+   'O': (2, ((0, 0), (1, 0), (0, 1), (1, 1))),
+   'Z': (3, ((0, 0), (1, 0), (1, 1), (2, 1))),
+   'Z-90': (3, ((2, 0), (1, 1), (2, 1), (1, 2))),
+   'Z-180': (3, ((0, 1), (1, 1), (1, 2), (2, 2))),
+   'Z-270': (3, ((1, 0), (0, 1), (1, 1), (0, 2))),
+   'T': (3, ((0, 1), (1, 1), (2, 1), (1, 2))),
+   'T-90': (3, ((1, 0), (0, 1), (1, 1), (1, 2))),
+   'T-180': (3, ((1, 0), (0, 1), (1, 1), (2, 1))),
+   'T-270': (3, ((1, 0), (1, 1), (2, 1), (1, 2))),
+   'J': (3, ((1, 0), (1, 1), (1, 2), (0, 2))),
+   'J-90': (3, ((0, 0), (0, 1), (1, 1), (2, 1))),
+   'J-180': (3, ((1, 0), (2, 0), (1, 1), (1, 2))),
+   'J-270': (3, ((0, 1), (1, 1), (2, 1), (2, 2))),
+   'L': (3, ((1, 0), (1, 1), (1, 2), (2, 2))),
+   'L-90': (3, ((0, 1), (1, 1), (2, 1), (0, 2))),
+   'L-180': (3, ((0, 0), (1, 0), (1, 1), (1, 2))),
+   'L-270': (3, ((2, 0), (0, 1), (1, 1), (2, 1))),
+   'S': (3, ((1, 0), (2, 0), (0, 1), (1, 1))),
+   'S-90': (3, ((1, 0), (2, 2), (0, 1), (1, 1))),
+   'S-180': (3, ((1, 0), (1, 1), (2, 1), (2, 2))),
+   'S-270': (3, ((0, 0), (0, 1), (1, 1), (1, 2))),
+}
+
+# The rotation state reached from each type by rotating it (O does not rotate)
+ROTATION_MAPPING = {
+   'I': 'I-90', 'I-90': 'I-180', 'I-180': 'I-270', 'I-270': 'I',
+   'O': 'O',
+   'Z': 'Z-90', 'Z-90': 'Z-180', 'Z-180': 'Z-270', 'Z-270': 'Z',
+   'T': 'T-90', 'T-90': 'T-180', 'T-180': 'T-270', 'T-270': 'T',
+   'J': 'J-90', 'J-90': 'J-180', 'J-180': 'J-270', 'J-270': 'J',
+   'L': 'L-90', 'L-90': 'L-180', 'L-180': 'L-270', 'L-270': 'L',
+   'S': 'S-90', 'S-90': 'S-180', 'S-180': 'S-270', 'S-270': 'S'
+}
+
+# Precomputed data of a tetromino type: the occupied cells, the bounding box
+# of the cells in the tile matrix, the (row, col) of the leftmost/rightmost
+# cell of each occupied row and of the bottommost cell of each occupied column,
+# the type reached by rotating, and a bit mask of the occupied columns of each
+# row of the tile matrix (for the bitboard collision checks)
+Shape = namedtuple('Shape', ['type', 'n', 'cells',
+                             'min_row', 'max_row', 'min_col', 'max_col',
+                             'left_profile', 'right_profile', 'bottom_profile',
+                             'next_type', 'row_masks'])
+
+# A function for computing the precomputed data of a given tetromino type
+def _build_shape(shape_type):
+   n, cells = SHAPE_CELLS[shape_type]
+   rows = sorted(set(row for col, row in cells))
+   cols = sorted(set(col for col, row in cells))
+   left_profile = tuple((row, min(c for c, r in cells if r == row)) for row in rows)
+   right_profile = tuple((row, max(c for c, r in cells if r == row)) for row in rows)
+   bottom_profile = tuple((max(r for c, r in cells if c == col), col) for col in cols)
+   row_masks = tuple(sum(1 << c for c, r in cells if r == row) for row in range(n))
+   return Shape(shape_type, n, cells, rows[0], rows[-1], cols[0], cols[-1],
+                left_profile, right_profile, bottom_profile,
+                ROTATION_MAPPING[shape_type], row_masks)
+
+# The shape table built once when this module is imported
+SHAPES = {shape_type: _build_shape(shape_type) for shape_type in SHAPE_CELLS}
+
+# A class for modeling tetrominoes with 7 different types (and their rotations)
 class Tetromino:
    # the dimensions of the game grid (defined as class variables)
    grid_height, grid_width = None, None
-
-   # A constructor for creating a tetromino with a given shape (type)
-   def __init__(self, shape):
+   # when set, the collision checks use the bitboard (row masks) of the grid
+   # instead of checking the profile cells one by one
+   use_bitboard = True
+   # the layout of a snapshot (see snapshot): the type, the position of the
+   # bottom left cell and the log2 exponents of the tile values in the order
+   # of the cells of the shape
+   snapshot_layout = struct.Struct("<8shh4B")
+
+   # A constructor for creating a tetromino with a given shape (type), where
+   # the tile values and the initial column are given (see piece_generator) or
+   # drawn from the given random number generator (the random module by default)
+   def __init__(self, shape, rng=random, tile_values=None, x=None):
       self.type = shape  # set the type of this tetromino
-      # determine the occupied (non-empty) cells in the tile matrix based on
-      # the shape of this tetromino (see the documentation given with this code)
-      occupied_cells = []
-      if self.type == 'I':
-         n = 4  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino I in its initial rotation state
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((1, 3))
-
-      if self.type == 'I-90':
-         n = 4  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino I in its initial rotation state
-         occupied_cells.append((0, 1))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((3, 1))
-      
-      if self.type == 'I-180':
-         n = 4  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino I in its initial rotation state
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((1, 3))
-
-      if self.type == 'I-270':
-         n = 4  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino I in its initial rotation state
-         occupied_cells.append((0, 2))  # (column_index, row_index)
-         occupied_cells.append((1, 2))
-         occupied_cells.append((2, 2))
-         occupied_cells.append((3, 2))
-
-      elif self.type == 'O':
-         n = 2  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino O in its initial rotation state
-         occupied_cells.append((0, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-
-      elif self.type == 'Z':
-         n = 3  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino Z in1its initial rotation state
-         occupied_cells.append((0, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 0))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-
-      elif self.type == 'Z-90':
-         n = 3  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino Z in1its initial rotation state
-         occupied_cells.append((2, 0))  # (column_index, row_index)
-         occupied_cells.append((1,1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((1, 2))
-
-      elif self.type == 'Z-180':
-         n = 3  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino Z in its initial rotation state
-         occupied_cells.append((0, 1))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1,2))
-         occupied_cells.append((2, 2))
-
-      elif self.type == 'Z-270':
-         n = 3  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino Z in its initial rotation state
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1,1))
-         occupied_cells.append((0, 2))
-      
-
-      elif self.type == 'T':
-         n=3
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((1, 2))
-
-      elif self.type == 'T-90':
-         n=3
-         occupied_cells.append((1, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-
-      elif self.type == 'T-180':
-         n=3
-         occupied_cells.append((1, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-
-      elif self.type == 'T-270':
-         n=3
-         occupied_cells.append((1, 0))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((1, 2))
-
-
-      elif self.type == 'J':
-         n=3
-         occupied_cells.append((1, 0))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((0, 2))
-
-      elif self.type == 'J-90':
-         n=3
-         occupied_cells.append((0, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-      
-      elif self.type == 'J-180':
-         n=3
-         occupied_cells.append((1, 0))
-         occupied_cells.append((2, 0))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-
-      elif self.type == 'J-270':
-         n=3
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((2, 2))
-
-      elif self.type == 'L':
-         n = 3  # n değişkeni tanımlandı
-         occupied_cells.append((1, 0))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((2, 2))
-         occupied_cells.append((0, 2))
-         occupied_cells.append((1, 2))
-
-
-
-      elif self.type == 'L-90':
-         n=3
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((0, 2))
-      elif self.type == 'L-180':
-         n=3
-         occupied_cells.append((0, 0))
-         occupied_cells.append((1, 0))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-      elif self.type == 'L-270':
-         n=3
-         occupied_cells.append((2, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-
-      
-
-      
-
-      elif self.type == 'S':
-         n=3
-         occupied_cells.append((1, 0))
-         occupied_cells.append((2, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-
-      elif self.type == 'S-90':
-         n=3
-         occupied_cells.append((1, 0))
-         occupied_cells.append((2, 2))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-
-      elif self.type == 'S-180':
-         n=3
-         occupied_cells.append((1, 0))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((2, 2))
-
-      elif self.type == 'S-270':
-         n=3
-         occupied_cells.append((0, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
+      # look up the precomputed cells, bounding box and profiles of the type
+      self.shape = SHAPES[shape]
+      n = self.shape.n  # n = number of rows = number of columns in the tile matrix
       # create a matrix of numbered tiles based on the shape of this tetromino
       self.tile_matrix = np.full((n, n), None)
       # create the four tiles (minos) of this tetromino and place these tiles
-      # into the tile matrix
-      for i in range(len(occupied_cells)):
-         col_index, row_index = occupied_cells[i][0], occupied_cells[i][1]
+      # into the tile matrix; the values of the tiles (in the order of the
+      # cells of the shape) are drawn from rng unless they are given
+      if tile_values is None:
+         tile_values = [None] * len(self.shape.cells)
+      for (col_index, row_index), number in zip(self.shape.cells, tile_values):
          # create a tile for each occupied cell of this tetromino
-         self.tile_matrix[row_index][col_index] = Tile()
+         self.tile_matrix[row_index][col_index] = Tile(number, rng)
       # initialize the position of this tetromino (as the bottom left cell in
-      # the tile matrix) with a random horizontal position above the game grid
+      # the tile matrix) with the given or a random horizontal position above
+      # the game grid
       self.bottom_left_cell = Point()
       self.bottom_left_cell.y = Tetromino.grid_height - 1
-      self.bottom_left_cell.x = random.randint(0, Tetromino.grid_width - n)
+      if x is None:
+         x = rng.randint(0, Tetromino.grid_width - n)
+      self.bottom_left_cell.x = x
 
    # A method that computes and returns the position of the cell in the tile
    # matrix specified by the given row and column indexes
@@ -231,45 +123,100 @@ class Tetromino:
       position.y = self.bottom_left_cell.y + (n - 1) - row
       return position
 
-   # A method to return a copy of the tile matrix without any empty row/column,
-   # and the position of the bottom left cell when return_position is set
+   # A method that returns the state of this tetromino as a flat byte buffer
+   # (see snapshot_layout), without copying its tiles
+   def snapshot(self):
+      exponents = [int(self.tile_matrix[row][col].number).bit_length() - 1
+                   for col, row in self.shape.cells]
+      return Tetromino.snapshot_layout.pack(self.type.encode(), self.bottom_left_cell.x,
+                                            self.bottom_left_cell.y, *exponents)
+
+   # A method for restoring the state saved by snapshot from the given buffer
+   # starting at offset; returns the offset of the first byte after it
+   def restore(self, buffer, offset=0):
+      shape_type, x, y, *exponents = Tetromino.snapshot_layout.unpack_from(buffer, offset)
+      self.type = shape_type.rstrip(b"\0").decode()
+      self.shape = SHAPES[self.type]
+      n = self.shape.n
+      self.tile_matrix = np.full((n, n), None)
+      for (col_index, row_index), exponent in zip(self.shape.cells, exponents):
+         self.tile_matrix[row_index][col_index] = Tile(1 << exponent)
+      self.bottom_left_cell = Point(x, y)
+      return offset + Tetromino.snapshot_layout.size
+
+   # A class method that creates a tetromino from a snapshot (see restore)
+   @classmethod
+   def from_snapshot(cls, buffer, offset=0):
+      tetromino = cls.__new__(cls)
+      tetromino.restore(buffer, offset)
+      return tetromino
+
+   # A method to return the tile matrix without any empty row/column, and
+   # the position of the bottom left cell when return_position is set. The
+   # bounding box comes from the precomputed shape table and the returned
+   # matrix is a view of the tile matrix holding the tiles of this tetromino
+   # (not copies), so locking it hands the tiles over to the game grid.
    def get_min_bounded_tile_matrix(self, return_position=False):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      # determine rows and columns to copy (omit empty rows and columns)
-      min_row, max_row, min_col, max_col = n - 1, 0, n - 1, 0
-      for row in range(n):
-         for col in range(n):
-            if self.tile_matrix[row][col] is not None:
-               if row < min_row:
-                  min_row = row
-               if row > max_row:
-                  max_row = row
-               if col < min_col:
-                  min_col = col
-               if col > max_col:
-                  max_col = col
-      # copy the tiles from the tile matrix of this tetromino
-      copy = np.full((max_row - min_row + 1, max_col - min_col + 1), None)
-      for row in range(min_row, max_row + 1):
-         for col in range(min_col, max_col + 1):
-            if self.tile_matrix[row][col] is not None:
-               row_ind = row - min_row
-               col_ind = col - min_col
-               copy[row_ind][col_ind] = cp.deepcopy(self.tile_matrix[row][col])
-      # return just the matrix copy when return_position is not set (as True)
+      shape = self.shape
+      bounded = self.tile_matrix[shape.min_row:shape.max_row + 1,
+                                 shape.min_col:shape.max_col + 1]
+      # return just the matrix when return_position is not set (as True)
       # the argument return_position defaults to False when a value is not given
       if not return_position:
-         return copy
-      # otherwise return the position of the bottom left cell in copy as well
-      else:
-         blc_position = cp.copy(self.bottom_left_cell)
-         blc_position.translate(min_col, (n - 1) - max_row)
-         return copy, blc_position
+         return bounded
+      # otherwise return the position of the bottom left cell in it as well
+      blc_position = Point(self.bottom_left_cell.x + shape.min_col,
+                           self.bottom_left_cell.y + (shape.n - 1) - shape.max_row)
+      return bounded, blc_position
 
-   
+   # A method for dropping this tetromino straight down as far as it can go
    def hard_drop(self, game_grid):
-    while self.move("down", game_grid):
-        pass
+      if Tetromino.use_bitboard:
+         self.bottom_left_cell.y -= self.get_drop_distance(game_grid)
+         return
+      while self.move("down", game_grid):
+         pass
+
+   # A method that returns how many rows this tetromino can move down; when
+   # the tetromino is above every occupied cell in its columns, this is found
+   # in one step from the column heights of the grid and the bottom profile of
+   # the shape, otherwise by sliding its row masks down the bitboard of the grid
+   def get_drop_distance(self, game_grid):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      heights, n = game_grid.column_heights, self.shape.n
+      # the lowest y of the bottom left cell that keeps every bottommost tile
+      # on or above the height of its column
+      landing_y = max(heights[x + col] - (n - 1 - row)
+                      for row, col in self.shape.bottom_profile)
+      if landing_y <= y:
+         return y - int(landing_y)
+      distance = 0
+      while self.fits(self.shape, x, y - distance - 1, game_grid):
+         distance += 1
+      return distance
+
+   # A method for checking if the given shape placed with its bottom left cell
+   # at (x, y) lies inside the grid (cells above the grid are allowed) without
+   # overlapping any occupied cell, by using the bitboard of the grid
+   def fits(self, shape, x, y, game_grid):
+      if x + shape.min_col < 0 or x + shape.max_col >= Tetromino.grid_width:
+         return False
+      if y + (shape.n - 1) - shape.max_row < 0:
+         return False
+      row_masks = game_grid.row_masks
+      grid_row = y + shape.n - 1  # the grid row of the top row of the matrix
+      for mask in shape.row_masks:
+         if mask and grid_row < Tetromino.grid_height:
+            if row_masks[grid_row] & (mask << x if x >= 0 else mask >> -x):
+               return False
+         grid_row -= 1
+      return True
+
+   # A method that returns the position of the bottom left cell where this
+   # tetromino would land if it was hard dropped (e.g. for drawing a ghost)
+   def get_ghost_position(self, game_grid):
+      return Point(self.bottom_left_cell.x,
+                   self.bottom_left_cell.y - self.get_drop_distance(game_grid))
 
    # A method for drawing the tetromino on the game grid
    def draw(self):
@@ -284,49 +231,35 @@ class Tetromino:
                if position.y < Tetromino.grid_height:
                   self.tile_matrix[row][col].draw(position)
 
+   # A method for rotating this tetromino when the rotated shape fits on the
+   # grid; the tiles (and so their values) are kept in the rotated shape
    def rotate(self, game_grid):
+      new_shape = SHAPES[self.shape.next_type]
       # O tipi tetromino döndürme gerektirmez
-      if self.type == 'O':
-         return True
-
-      # Her tetromino türü için dönüş rotasyonlarının tanımlandığı harita
-      rotation_mapping = {
-         'I': 'I-90', 'I-90': 'I-180', 'I-180': 'I-270', 'I-270': 'I',
-         'Z': 'Z-90', 'Z-90': 'Z-180', 'Z-180': 'Z-270', 'Z-270': 'Z',
-         'T': 'T-90', 'T-90': 'T-180', 'T-180': 'T-270', 'T-270': 'T',
-         'J': 'J-90', 'J-90': 'J-180', 'J-180': 'J-270', 'J-270': 'J',
-         'L': 'L-90', 'L-90': 'L-180', 'L-180': 'L-270', 'L-270': 'L',
-         'S': 'S-90', 'S-90': 'S-180', 'S-180': 'S-270', 'S-270': 'S'
-      }
-
-      # Mevcut duruma göre yeni type'ı belirle
-      new_type = rotation_mapping.get(self.type, self.type)
-
-      # Yeni rotasyon durumunu oluştur
-      temp = Tetromino(new_type)
-      temp.bottom_left_cell = self.bottom_left_cell
-      n = len(temp.tile_matrix)
-      for row in range(n):
-         for col in range(n):
-            if temp.tile_matrix[row][col] is not None:
-               pos = temp.get_cell_position(row, col)
-               if not (0 <= pos.x < Tetromino.grid_width and 0 <= pos.y < Tetromino.grid_height):
-                  return False  # grid dışına taşarsa rotasyon iptal
-
-               if game_grid.is_occupied(pos.y, pos.x):  # çakışma kontrolü
-                  return False
-
-         # Eğer sıkıntı yoksa rotasyonu uygula
-         self.type = new_type
-         self.tile_matrix = temp.tile_matrix
+      if new_shape is self.shape:
          return True
-
-      
-
-
-
-
-
+      n = new_shape.n
+      if Tetromino.use_bitboard:
+         # grid dışına taşarsa veya çakışırsa rotasyon iptal
+         top_y = self.bottom_left_cell.y + (n - 1) - new_shape.min_row
+         if top_y >= Tetromino.grid_height or not self.fits(
+               new_shape, self.bottom_left_cell.x, self.bottom_left_cell.y, game_grid):
+            return False
+      for col, row in new_shape.cells if not Tetromino.use_bitboard else ():
+         x = self.bottom_left_cell.x + col
+         y = self.bottom_left_cell.y + (n - 1) - row
+         if not (0 <= x < Tetromino.grid_width and 0 <= y < Tetromino.grid_height):
+            return False  # grid dışına taşarsa rotasyon iptal
+         if game_grid.is_occupied(y, x):  # çakışma kontrolü
+            return False
+      # Eğer sıkıntı yoksa rotasyonu uygula
+      tiles = [self.tile_matrix[row][col] for col, row in self.shape.cells]
+      self.tile_matrix = np.full((n, n), None)
+      for (col, row), tile in zip(new_shape.cells, tiles):
+         self.tile_matrix[row][col] = tile
+      self.type = new_shape.type
+      self.shape = new_shape
+      return True
 
    # A method for moving this tetromino in a given direction by 1 on the grid
    def move(self, direction, game_grid):
@@ -344,53 +277,44 @@ class Tetromino:
       return True  # a successful move in the given direction
 
    # A method for checking if this tetromino can be moved in a given direction
+   # by using the precomputed left/right/bottom profiles of its shape
    def can_be_moved(self, direction, game_grid):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      # check for moving left or right
-      if direction == "left" or direction == "right":
-         for row_index in range(n):
-            for col_index in range(n):
-               # direction = left --> check the leftmost tile of each row
-               row, col = row_index, col_index
-               if direction == "left" and self.tile_matrix[row][col] is not None:
-                  # the position of the leftmost tile of the current row
-                  leftmost = self.get_cell_position(row, col)
-                  # if any leftmost tile is at x = 0
-                  if leftmost.x == 0:
-                     return False  # this tetromino cannot be moved left
-                  # if the grid cell on the left of a leftmost tile is occupied
-                  if game_grid.is_occupied(leftmost.y, leftmost.x - 1):
-                     return False  # this tetromino cannot be moved left
-                  # as the leftmost tile of the current row is checked
-                  break  # end the inner for loop
-               # direction = right --> check the rightmost tile of each row
-               row, col = row_index, n - 1 - col_index
-               if direction == "right" and self.tile_matrix[row][col] is not None:
-                  # the position of the rightmost tile of the current row
-                  rightmost = self.get_cell_position(row, col)
-                  # if any rightmost tile is at x = grid_width - 1
-                  if rightmost.x == Tetromino.grid_width - 1:
-                     return False  # this tetromino cannot be moved right
-                  # if the grid cell on the right of a rightmost tile is occupied
-                  if game_grid.is_occupied(rightmost.y, rightmost.x + 1):
-                     return False  # this tetromino cannot be moved right
-                  # as the rightmost tile of the current row is checked
-                  break  # end the inner for loop
+      if Tetromino.use_bitboard:
+         # the shifted shape must fit on the bitboard of the grid
+         x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+         if direction == "left":
+            return self.fits(self.shape, x - 1, y, game_grid)
+         if direction == "right":
+            return self.fits(self.shape, x + 1, y, game_grid)
+         return self.fits(self.shape, x, y - 1, game_grid)
+      n = self.shape.n  # n = number of rows = number of columns
+      blc_x, top_y = self.bottom_left_cell.x, self.bottom_left_cell.y + (n - 1)
+      # direction = left --> check the leftmost tile of each row
+      if direction == "left":
+         for row, col in self.shape.left_profile:
+            # if any leftmost tile is at x = 0
+            if blc_x + col == 0:
+               return False  # this tetromino cannot be moved left
+            # if the grid cell on the left of a leftmost tile is occupied
+            if game_grid.is_occupied(top_y - row, blc_x + col - 1):
+               return False  # this tetromino cannot be moved left
+      # direction = right --> check the rightmost tile of each row
+      elif direction == "right":
+         for row, col in self.shape.right_profile:
+            # if any rightmost tile is at x = grid_width - 1
+            if blc_x + col == Tetromino.grid_width - 1:
+               return False  # this tetromino cannot be moved right
+            # if the grid cell on the right of a rightmost tile is occupied
+            if game_grid.is_occupied(top_y - row, blc_x + col + 1):
+               return False  # this tetromino cannot be moved right
       # direction = down --> check the bottommost tile of each column
       else:
-         for col in range(n):
-            for row in range(n - 1, -1, -1):
-               # if the current cell of the tetromino is occupied by a tile
-               if self.tile_matrix[row][col] is not None:
-                  # the position of the bottommost tile of the current col
-                  bottommost = self.get_cell_position(row, col)
-                  # if any bottommost tile is at y = 0
-                  if bottommost.y == 0:
-                     return False  # this tetromino cannot be moved down
-                  # if the grid cell below any bottommost tile is occupied
-                  if game_grid.is_occupied(bottommost.y - 1, bottommost.x):
-                     return False  # this tetromino cannot be moved down
-                  # as the bottommost tile of the current row is checked
-                  break  # end the inner for loop
+         for row, col in self.shape.bottom_profile:
+            # if any bottommost tile is at y = 0
+            if top_y - row == 0:
+               return False  # this tetromino cannot be moved down
+            # if the grid cell below any bottommost tile is occupied
+            if game_grid.is_occupied(top_y - row - 1, blc_x + col):
+               return False  # this tetromino cannot be moved down
       # if this method does not end by returning False before this line
       return True  # this tetromino can be moved in the given direction
@@ -1,4 +1,3 @@
-import lib.stddraw as stddraw
 from lib.color import Color
 import random  # used for setting initial tile values
 
@@ -29,9 +28,10 @@ class Tile:
     DEFAULT_TEXT_COLOR = Color(249, 246, 242)
     DEFAULT_BG_COLOR = Color(205, 193, 180)
 
-    def __init__(self):
-        # Initialize with 2 or 4
-        self.number = random.choice([2, 4])
+    def __init__(self, number=None, rng=random):
+        # Initialize with the given value or randomly with 2 or 4 (drawn from
+        # the given random number generator, the random module by default)
+        self.number = rng.choice([2, 4]) if number is None else number
         # Assign colors based on value
         self.update_colors()
         # Fixed border color
@@ -44,16 +44,14 @@ class Tile:
         self.foreground_color = Tile.VALUE_TO_TEXT_COLOR.get(self.number, Tile.DEFAULT_TEXT_COLOR)
 
     def draw(self, position, length=1):
-        # Draw tile background
-        stddraw.setPenColor(self.background_color)
-        stddraw.filledSquare(position.x, position.y, length / 2)
-        # Draw border
-        stddraw.setPenColor(self.box_color)
-        stddraw.setPenRadius(Tile.boundary_thickness)
-        stddraw.square(position.x, position.y, length / 2)
-        stddraw.setPenRadius()
-        # Draw number
-        stddraw.setPenColor(self.foreground_color)
+        # stddraw (pygame) is imported only when drawing, so that the game
+        # logic can run without a display
+        import lib.stddraw as stddraw
+        # Draw the tile background, border and number together as a single
+        # pre-rendered sprite (cached by stddraw for each value and size)
         stddraw.setFontFamily(Tile.font_family)
         stddraw.setFontSize(Tile.font_size)
-        stddraw.text(position.x, position.y, str(self.number))
+        stddraw.labeledSquare(position.x, position.y, length / 2,
+                              self.background_color, self.box_color,
+                              Tile.boundary_thickness, self.foreground_color,
+                              str(self.number))
@@ -0,0 +1,102 @@
+################################################################################
+#                                                                              #
+# A tournament runner that plays seeded headless games of Tetris 2048 with an  #
+# automated agent (policy) on a pool of worker processes                       #
+#                                                                              #
+################################################################################
+
+from concurrent.futures import ProcessPoolExecutor, as_completed  # the workers
+from game_engine import TetrisGame, ACTIONS  # the headless game engine
+import numpy as np  # the fundamental Python module for scientific computing
+import argparse  # used for parsing the command line arguments
+import random  # used for the random number generators of the policies
+
+# The record stored for each game in a results file (little-endian fields)
+RESULT_DTYPE = np.dtype([('seed', '<i8'), ('score', '<i8'),
+                         ('pieces_placed', '<i4'), ('max_tile', '<i4'),
+                         ('lines_cleared', '<i4')])
+
+# A policy chooses the action of each game step: it is called with the game
+# and a random number generator of its own (seeded from the game seed) and
+# returns one of ACTIONS or None. Policies are sent to the worker processes,
+# so they must be defined at the top level of a module.
+
+# A policy that chooses a random action (or no action) at each step
+def random_policy(game, rng):
+   return rng.choice((None,) + ACTIONS)
+
+# A function for playing one game with the given seed and policy until the
+# game is over (or max_steps steps are played); returns the result record
+def play_game(seed, policy=random_policy, grid_h=20, grid_w=12, max_steps=100000):
+   game = TetrisGame(grid_h, grid_w, seed, packed=True)
+   # the policy gets a random stream that depends only on the game seed
+   policy_rng = random.Random(f"policy-{seed}")
+   for _ in range(max_steps):
+      if game.step(policy(game, policy_rng)):
+         break
+   max_exponent = int(game.grid.exponent_matrix.max())
+   max_tile = 1 << max_exponent if max_exponent > 0 else 0
+   return (seed, game.grid.score, game.pieces_placed, max_tile,
+           game.grid.lines_cleared)
+
+# A function for playing the games of a chunk of seeds in a worker process
+def _play_chunk(seeds, policy, grid_h, grid_w, max_steps):
+   results = [play_game(seed, policy, grid_h, grid_w, max_steps) for seed in seeds]
+   return np.array(results, dtype=RESULT_DTYPE)
+
+# A generator function that plays n_games games with the seeds base_seed,
+# base_seed + 1, ... on a pool of worker processes (all the cores by default)
+# and yields the result records of each chunk of games as soon as it is
+# finished; each result depends only on its seed, not on the worker count
+def iter_tournament(n_games, policy=random_policy, base_seed=0, workers=None,
+                    chunk_size=16, grid_h=20, grid_w=12, max_steps=100000):
+   seeds = range(base_seed, base_seed + n_games)
+   chunks = [seeds[i:i + chunk_size] for i in range(0, n_games, chunk_size)]
+   # a single worker plays the games in this process
+   if workers == 1:
+      for chunk in chunks:
+         yield _play_chunk(chunk, policy, grid_h, grid_w, max_steps)
+      return
+   with ProcessPoolExecutor(workers) as pool:
+      futures = [pool.submit(_play_chunk, chunk, policy, grid_h, grid_w, max_steps)
+                 for chunk in chunks]
+      for future in as_completed(futures):
+         yield future.result()
+
+# A function for running a tournament (see iter_tournament) that appends the
+# result records to the binary file out_path (if given) as they arrive and
+# returns all the results sorted by seed
+def run_tournament(n_games, policy=random_policy, base_seed=0, workers=None,
+                   chunk_size=16, out_path=None, **game_options):
+   out_file = open(out_path, "ab") if out_path is not None else None
+   results = []
+   try:
+      for records in iter_tournament(n_games, policy, base_seed, workers,
+                                     chunk_size, **game_options):
+         if out_file is not None:
+            records.tofile(out_file)
+            out_file.flush()
+         results.append(records)
+   finally:
+      if out_file is not None:
+         out_file.close()
+   results = np.concatenate(results) if results else np.empty(0, RESULT_DTYPE)
+   return np.sort(results, order='seed')
+
+# A function for loading the result records of a results file sorted by seed
+def load_results(path):
+   return np.sort(np.fromfile(path, dtype=RESULT_DTYPE), order='seed')
+
+# run a tournament with the random policy when this file is executed
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description="Play seeded headless games of Tetris 2048")
+   parser.add_argument("games", type=int, help="the number of games to play")
+   parser.add_argument("--seed", type=int, default=0, help="the seed of the first game")
+   parser.add_argument("--workers", type=int, default=None, help="the number of worker processes")
+   parser.add_argument("--chunk-size", type=int, default=16, help="the number of games per task")
+   parser.add_argument("--out", default=None, help="the results file to append to")
+   args = parser.parse_args()
+   results = run_tournament(args.games, random_policy, args.seed, args.workers,
+                            args.chunk_size, args.out)
+   print(f"games: {len(results)}  mean score: {results['score'].mean():.1f}  "
+         f"best score: {results['score'].max()}  best tile: {results['max_tile'].max()}")